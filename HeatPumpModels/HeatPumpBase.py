@@ -1,14 +1,32 @@
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 
-import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
 from CoolProp.CoolProp import PropsSI as PSI
-from fluprodia import FluidPropertyDiagram
+from scipy.interpolate import interpn
+from sklearn.linear_model import LinearRegression
 from tespy.networks import Network
 from tespy.tools import ExergyAnalysis
 
 
+@lru_cache(maxsize=None)
+def saturation_pressure(T, Q, wf):
+    """Calculate saturation pressure in bar at temperature T in °C."""
+    return PSI('P', 'Q', Q, 'T', T + 273.15, wf) * 1e-5
+
+
+@lru_cache(maxsize=None)
+def load_cepci():
+    """Load chemical engineering plant cost index (CEPCI) by year."""
+    cepcipath = os.path.join(__file__, '..', 'input', 'CEPCI.json')
+    with open(cepcipath, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
 class HeatPumpBase:
     """Super class of all concrete heat pump models."""
 
@@ -19,21 +37,18 @@ class HeatPumpBase:
         self.si = self.params['fluids']['si']
         self.so = self.params['fluids']['so']
 
-        if self.si == self.so:
-            self.fluid_vec_wf = {self.wf: 1, self.si:0}
-            self.fluid_vec_si = {self.wf: 0, self.si: 1}
-            self.fluid_vec_so = {self.wf: 0, self.si: 1}
-        else:
-            self.fluid_vec_wf = {self.wf: 1, self.si: 0, self.so: 0}
-            self.fluid_vec_si = {self.wf: 0, self.si: 1, self.so: 0}
-            self.fluid_vec_so = {self.wf: 0, self.si: 0, self.so: 1}
+        # Heat sink and source may share the same fluid
+        fluid_vec = dict.fromkeys((self.wf, self.si, self.so), 0)
+        self.fluid_vec_wf = {**fluid_vec, self.wf: 1}
+        self.fluid_vec_si = {**fluid_vec, self.si: 1}
+        self.fluid_vec_so = {**fluid_vec, self.so: 1}
 
         self.comps = dict()
         self.conns = dict()
         self.busses = dict()
 
         self.nw = Network(
-            fluids=[fluid for fluid in self.fluid_vec_wf],
+            fluids=list(fluid_vec),
             T_unit='C', p_unit='bar', h_unit='kJ / kg',
             m_unit='kg / s'
             )
@@ -73,9 +88,8 @@ class HeatPumpBase:
             / self.busses['power input'].P.val
             )
 
-        if 'print_results' in kwargs:
-            if kwargs['print_results']:
-                self.nw.print_results()
+        if kwargs.get('print_results'):
+            self.nw.print_results()
         if self.nw.res[-1] < 1e-3:
             self.solved_design = True
             self.nw.save(self.design_path)
@@ -129,33 +143,287 @@ class HeatPumpBase:
 
     def df_to_array(self, results_offdesign):
         """Create 3D arrays of heat output and power input from DataFrame."""
-        self.Q_array = []
-        self.P_array = []
+        shape = (
+            len(self.T_hs_ff_range), len(self.T_cons_ff_range),
+            len(self.pl_range)
+            )
+        self.Q_array = np.empty(shape)
+        self.P_array = np.empty(shape)
         for i, T_hs_ff in enumerate(self.T_hs_ff_range):
-            self.Q_array.append([])
-            self.P_array.append([])
-            for T_cons_ff in self.T_cons_ff_range:
-                self.Q_array[i].append(
-                    results_offdesign.loc[(T_hs_ff, T_cons_ff), 'Q'].tolist()
+            for j, T_cons_ff in enumerate(self.T_cons_ff_range):
+                QP = results_offdesign.loc[(T_hs_ff, T_cons_ff), ['Q', 'P']]
+                self.Q_array[i, j, :] = QP['Q'].to_numpy()
+                self.P_array[i, j, :] = QP['P'].to_numpy()
+
+    def calc_partload_char(self, **kwargs):
+        """
+        Interpolate data points of heat output and power input.
+
+        Return functions to interpolate values heat output and
+        power input based on the partload and the feed flow
+        temperatures of the heat source and sink. If there is
+        no data given through keyword arguments, the instances
+        attributes will be searched for the necessary data.
+
+        Parameters
+        ----------
+        kwargs : dict
+            Necessary data is:
+                Q_array : 3d array
+                P_array : 3d array
+                pl_range : 1d array
+                T_hs_ff_range : 1d array
+                T_cons_ff_range : 1d array
+        """
+        necessary_params = [
+            'Q_array', 'P_array', 'pl_range', 'T_hs_ff_range',
+            'T_cons_ff_range'
+            ]
+        if len(kwargs):
+            for nec_param in necessary_params:
+                if nec_param not in kwargs:
+                    raise KeyError(
+                        f'Necessary parameter {nec_param} not '
+                        + 'in kwargs. The necessary parameters'
+                        + f' are: {necessary_params}'
+                        )
+            Q_array = np.asarray(kwargs['Q_array'])
+            P_array = np.asarray(kwargs['P_array'])
+            pl_range = kwargs['pl_range']
+            T_hs_ff_range = kwargs['T_hs_ff_range']
+            T_cons_ff_range = kwargs['T_cons_ff_range']
+        else:
+            for nec_param in necessary_params:
+                if nec_param not in self.__dict__:
+                    raise AttributeError(
+                        f'Necessary parameter {nec_param} can '
+                        + 'not be found in the instances '
+                        + 'attributes. Please make sure to '
+                        + 'perform the offdesign_simulation '
+                        + 'method or provide the necessary '
+                        + 'parameters as kwargs. These are: '
+                        + f'{necessary_params}'
+                        )
+            Q_array = np.asarray(self.Q_array)
+            P_array = np.asarray(self.P_array)
+            pl_range = self.pl_range
+            T_hs_ff_range = self.T_hs_ff_range
+            T_cons_ff_range = self.T_cons_ff_range
+
+        pl_step = 0.01
+        T_hs_ff_step = 1
+        T_cons_ff_step = 1
+
+        pl_fullrange = np.arange(
+            pl_range[0],
+            pl_range[-1]+pl_step,
+            pl_step
+            )
+        T_hs_ff_fullrange = np.arange(
+            T_hs_ff_range[0], T_hs_ff_range[-1]+T_hs_ff_step, T_hs_ff_step
+            )
+        T_cons_ff_fullrange = np.arange(
+            T_cons_ff_range[0], T_cons_ff_range[-1]+T_cons_ff_step,
+            T_cons_ff_step
+            )
+
+        multiindex = pd.MultiIndex.from_product(
+                        [T_hs_ff_fullrange, T_cons_ff_fullrange, pl_fullrange],
+                        names=['T_hs_ff', 'T_cons_ff', 'pl']
+                        )
+
+        # Interpolate all grid points at once instead of point by point
+        grid = np.column_stack([
+            multiindex.get_level_values(name).to_numpy().round(3)
+            for name in multiindex.names
+            ])
+        sample_points = (T_hs_ff_range, T_cons_ff_range, pl_range)
+        Q = np.abs(interpn(sample_points, Q_array, grid, bounds_error=False))
+        P = interpn(sample_points, P_array, grid, bounds_error=False)
+
+        partload_char = pd.DataFrame(
+            {'Q': Q, 'P': P, 'COP': Q / P}, index=multiindex
+            )
+
+        return partload_char
+
+    def linearize_partload_char(self, partload_char, variable='P',
+                                line_type='offset', regression_type='OLS',
+                                normalize=None):
+        """
+        Linearize partload characteristic for usage in MILP problems.
+
+        Parameters
+        ----------
+        partload_char : pd.DataFrame
+            DataFrame of the full partload characteristic containing 'Q', 'P'
+            and 'COP' with a MultiIndex of the three variables 'T_hs_ff',
+            'T_cons_ff' and 'pl'.
+
+        variable : str
+            The variable 'x' in the equation 'y = m * x + b'. Either 'P' or 'Q'.
+            Defaults to 'P' if it is not set.
+
+        line_type : str
+            Type of linear model to generate. Options are 'origin' for a line
+            through the origin or 'offset' for mixed integer offset model.
+            Defaults to 'offset' if it is not set.
+
+        regression_type : str
+            Type of regression method to use for linearization of the partload
+            characteristic. Options are 'OLS' for the method of ordinary least
+            squares or 'MinMax' for a line from the minimum to the maximum
+            value.
+            Defaults to 'OLS' if it is not set.
+
+        normalize : dict
+            Dictionairy containing the keys 'T_hs_ff' and 'T_cons_ff'. These
+            values are interpreted as the nominal operating temperatures. All
+            linear parameters are normalized to the chosen variable at this
+            operating point.
+            Defaults to None and therefore no normalization if it is not set.
+        """
+        cols = [f'{variable}_max', f'{variable}_min']
+        if line_type == 'origin':
+            cols += ['COP']
+        elif line_type == 'offset':
+            cols += ['c_1', 'c_0']
+
+        T_hs_ff_range = partload_char.index.unique(level='T_hs_ff')
+        T_cons_ff_range = partload_char.index.unique(level='T_cons_ff')
+
+        multiindex = pd.MultiIndex.from_product(
+            [T_hs_ff_range, T_cons_ff_range],
+            names=['T_hs_ff', 'T_cons_ff']
+            )
+        linear_model = pd.DataFrame(index=multiindex, columns=cols)
+
+        if variable == 'P':
+            resp_variable = 'Q'
+        elif variable == 'Q':
+            resp_variable = 'P'
+        else:
+            raise ValueError(
+                f"Argument {variable} for parameter 'variable' is not valid."
+                + "Choose either 'P' or 'Q'."
+                )
+
+        for T_hs_ff in T_hs_ff_range:
+            for T_cons_ff in T_cons_ff_range:
+                idx = (T_hs_ff, T_cons_ff)
+                linear_model.loc[idx, f'{variable}_max'] = (
+                    partload_char.loc[idx, variable].max()
                     )
-                self.P_array[i].append(
-                    results_offdesign.loc[(T_hs_ff, T_cons_ff), 'P'].tolist()
+                linear_model.loc[idx, f'{variable}_min'] = (
+                    partload_char.loc[idx, variable].min()
                     )
+                if regression_type == 'MinMax':
+                    if line_type == 'origin':
+                        linear_model.loc[idx, 'COP'] = (
+                            partload_char.loc[idx, 'Q'].max()
+                            / partload_char.loc[idx, 'P'].max()
+                            )
+                    elif line_type == 'offset':
+                        linear_model.loc[idx, 'c_1'] = (
+                            (partload_char.loc[idx, 'Q'].max()
+                             - partload_char.loc[idx, 'Q'].min())
+                            / (partload_char.loc[idx, 'P'].max()
+                               - partload_char.loc[idx, 'P'].min())
+                            )
+                        linear_model.loc[idx, 'c_0'] = (
+                            partload_char.loc[idx, 'Q'].max()
+                            - partload_char.loc[idx, 'P'].max()
+                            * linear_model.loc[idx, 'c_1']
+                            )
+                elif regression_type == 'OLS':
+                    regressor = partload_char.loc[idx, variable].to_numpy()
+                    regressor = regressor.reshape(-1, 1)
+                    response = partload_char.loc[idx, resp_variable].to_numpy()
+                    if line_type == 'origin':
+                        LinReg = LinearRegression(fit_intercept=False).fit(
+                            regressor, response
+                            )
+                        linear_model.loc[idx, 'COP'] = LinReg.coef_[0]
+                    elif line_type == 'offset':
+                        LinReg = LinearRegression().fit(regressor, response)
+                        linear_model.loc[idx, 'c_1'] = LinReg.coef_[0]
+                        linear_model.loc[idx, 'c_0'] = LinReg.intercept_
+
+        if normalize:
+            variable_nom = partload_char.loc[
+                (np.round(normalize['T_hs_ff'], 3),
+                 np.round(normalize['T_cons_ff'], 3)),
+                variable
+                ].max()
+
+            linear_model[f'{variable}_max'] /= variable_nom
+            linear_model[f'{variable}_min'] /= variable_nom
+            if line_type == 'offset':
+                linear_model['c_0'] /= variable_nom
+                linear_model['c_1'] /= variable_nom
+
+        return linear_model
+
+    def arrange_char_timeseries(self, linear_model, temp_ts, clip=True):
+        """
+        Arrange a timeseries of the characteristics based on temperature data.
+
+        If T_cons_ff in temperature timeseries is out of bounds, the closest
+        characteristic (min. or max. temperature) is used. With clip=False a
+        KeyError is raised instead.
+
+        Parameters
+        ----------
+        linear_model : pd.DataFrame
+            DataFrame of the linearized partload characteristic with a
+            MultiIndex of the three variables 'T_hs_ff' and 'T_cons_ff'.
+
+        temp_ts : pd.DataFrame
+            Timeseries of 'T_hs_ff' and 'T_cons_ff' as they occur in the period
+            observed.
+
+        clip : bool
+            Flag to set 'False' if out of bounds temperatures should raise a
+            KeyError. (Default: 'True')
+        """
+        # Look up all time steps at once instead of filling row by row
+        T_hs_ff = temp_ts['T_hs_ff'].to_numpy()
+        T_cons_ff = temp_ts['T_cons_ff'].to_numpy()
+        if clip:
+            T_cons_ff_range = linear_model.index.get_level_values('T_cons_ff')
+            T_cons_ff_min = T_cons_ff_range.min()
+            T_cons_ff_max = T_cons_ff_range.max()
+
+            missing = ~pd.MultiIndex.from_arrays(
+                [T_hs_ff, T_cons_ff]
+                ).isin(linear_model.index)
+            for T in T_cons_ff[missing]:
+                print(T, 'not in linear_model.')
+            T_cons_ff = np.where(
+                missing, np.clip(T_cons_ff, T_cons_ff_min, T_cons_ff_max),
+                T_cons_ff
+                )
+
+        multi_idx = pd.MultiIndex.from_arrays([T_hs_ff, T_cons_ff])
+        still_missing = ~multi_idx.isin(linear_model.index)
+        if still_missing.any():
+            raise KeyError(multi_idx[still_missing][0])
+
+        char_ts = linear_model.reindex(multi_idx)
+        char_ts.index = temp_ts.index
+
+        return char_ts
 
     def get_pressure_levels(self, T_evap, T_cond, wf=None):
         """Calculate evaporation, condensation and middle pressure in bar."""
         if not wf:
             wf = self.wf
-        p_evap = PSI(
-            'P', 'Q', 1,
-            'T', T_evap - self.params['evap']['ttd_l'] + 273.15,
-            wf
-            ) * 1e-5
-        p_cond = PSI(
-            'P', 'Q', 0,
-            'T', T_cond + self.params['cond']['ttd_u'] + 273.15,
-            wf
-            ) * 1e-5
+        p_evap = saturation_pressure(
+            T_evap - self.params['evap']['ttd_l'], 1, wf
+            )
+        p_cond = saturation_pressure(
+            T_cond + self.params['cond']['ttd_u'], 0, wf
+            )
         p_mid = np.sqrt(p_evap * p_cond)
 
         return p_evap, p_cond, p_mid
@@ -170,9 +438,7 @@ class HeatPumpBase:
 
         DOI: https://doi.org/10.1016/j.enconman.2020.113488
         """
-        cepcipath = os.path.join(__file__, '..', 'input', 'CEPCI.json')
-        with open(cepcipath, 'r', encoding='utf-8') as file:
-            cepci = json.load(file)
+        cepci = load_cepci()
         if isinstance(ref_year, int):
             ref_year = str(ref_year)
         if isinstance(current_year, int):
@@ -182,6 +448,10 @@ class HeatPumpBase:
         self.cost = {}
         self.design_params = {}
         compcost_total = 0
+        conns_by_source = {
+            (conn.source.label, conn.source_id): conn
+            for conn in self.nw.conns['object']
+            }
         for complabel in self.nw.comps.index:
             comp = self.nw.comps.loc[complabel, 'object']
             comptype = self.nw.comps.loc[complabel, 'comp_type']
@@ -212,24 +482,16 @@ class HeatPumpBase:
                     ) * cepci_factor
                 self.design_params[complabel] = val
 
-            elif comptype == 'DropletSeparator' or comptype == 'Drum':
+            elif comptype in ('DropletSeparator', 'Drum'):
                 residence_time = 10
-                conn_liquid = (
-                    self.nw.conns[
-                        (self.nw.conns['source'].apply(lambda x: x.label) == complabel)
-                        & (self.nw.conns['source_id'] == 'out1')].index
-                )[0]
-                conn_vapor = (
-                    self.nw.conns[
-                        (self.nw.conns['source'].apply(lambda x: x.label) == complabel)
-                        & (self.nw.conns['source_id'] == 'out2')].index
-                )[0]
-                p_flash = self.nw.get_conn(conn_vapor).p.val
+                conn_liquid = conns_by_source[(complabel, 'out1')]
+                conn_vapor = conns_by_source[(complabel, 'out2')]
+                p_flash = conn_vapor.p.val
                 dens_liquid = PSI('D', 'Q', 0, 'P', p_flash*1e5, self.wf)
                 dens_vapor = PSI('D', 'Q', 1, 'P', p_flash*1e5, self.wf)
                 V_flash = (
-                    (self.nw.get_conn(conn_liquid).m.val  / dens_liquid
-                     + self.nw.get_conn(conn_vapor).m.val / dens_vapor)
+                    (conn_liquid.m.val / dens_liquid
+                     + conn_vapor.m.val / dens_vapor)
                     * residence_time
                     )
                 self.cost[complabel] = self.eval_costfunc(
@@ -306,6 +568,10 @@ class HeatPumpBase:
                 )
             return
 
+        # Plotting libraries are only needed here, so import them lazily
+        import matplotlib.pyplot as plt
+        from fluprodia import FluidPropertyDiagram
+
         # Initialize fluid property diagram
         fig, ax = plt.subplots(figsize=figsize)
         diagram = FluidPropertyDiagram(refrig)
@@ -360,8 +626,8 @@ class HeatPumpBase:
 
         # Draw heat pump process over fluid property diagram
         # Note: 1st and last value is ommited, as they're sometimes error prone
-        for i, key in enumerate(result_dict.keys()):
-            datapoints = result_dict[key]['datapoints']
+        for i, (key, states) in enumerate(result_dict.items()):
+            datapoints = states['datapoints']
             ax.plot(
                 datapoints[var['x']][:], datapoints[var['y']][:],
                 color='#EC6707'
@@ -405,8 +671,52 @@ class HeatPumpBase:
             return diagram
 
     def validate_dir(self):
-        """Check for a 'stable' directory and create it if necessary."""
-        if not os.path.exists(os.path.join(__file__, '..', 'stable')):
-            os.mkdir(os.path.join(__file__, '..', 'stable'))
-        if not os.path.exists(os.path.join(__file__, '..', 'output')):
-            os.mkdir(os.path.join(__file__, '..', 'output'))
+        """Create the 'stable' and 'output' directories if necessary."""
+        # Parallel design workers may create them concurrently
+        os.makedirs(os.path.join(__file__, '..', 'stable'), exist_ok=True)
+        os.makedirs(os.path.join(__file__, '..', 'output'), exist_ok=True)
+
+
+def _run_design(model, params, model_kwargs, job):
+    """Instantiate heat pump model, run design simulation and return COP."""
+    hp = model(params, **model_kwargs)
+    # Parameter sets of the same setup would overwrite each others design
+    hp.design_path = f'{hp.design_path}_{job}'
+    hp.run_model()
+    return hp.cop
+
+
+def run_designs_parallel(model, params_list, n_jobs=None, **model_kwargs):
+    """
+    Run design simulations of multiple parameter sets in parallel.
+
+    Each parameter set is solved in its own process, as the TESPy solver
+    is mostly pure Python and therefore does not profit from threads. The
+    design state of each job is saved with the job index appended to the
+    design path.
+
+    Parameters
+    ----------
+    model : type
+        Heat pump model class, e.g. HeatPumpSimple.
+
+    params_list : list of dict
+        Parameter dictionaries to design a heat pump with each.
+
+    n_jobs : int
+        Number of worker processes. Defaults to the number of processors.
+
+    model_kwargs : dict
+        Additional keyword arguments passed to the model on instantiation,
+        e.g. econ_type.
+
+    Returns
+    -------
+    list of float
+        COP of each design simulation in the order of params_list.
+    """
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        return list(executor.map(
+            _run_design, repeat(model), params_list, repeat(model_kwargs),
+            range(len(params_list))
+            ))
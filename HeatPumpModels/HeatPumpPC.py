@@ -1,21 +1,14 @@
-import json
 import os
 from datetime import datetime
 from time import time
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from CoolProp.CoolProp import PropsSI as PSI
-from fluprodia import FluidPropertyDiagram
-from scipy.interpolate import interpn
-from sklearn.linear_model import LinearRegression
 from tespy.components import (Compressor, Condenser, CycleCloser,
                               DropletSeparator, HeatExchanger,
                               HeatExchangerSimple, Merge, Pump, Sink, Source,
                               Splitter, Valve)
 from tespy.connections import Bus, Connection, Ref
-from tespy.tools import ExergyAnalysis
 from tespy.tools.characteristics import CharLine
 from tespy.tools.characteristics import load_default_char as ldc
 
@@ -31,7 +24,7 @@ class HeatPumpPC(HeatPumpBase):
     def __init__(self, params, econ_type='closed'):
         """Initialize model and set necessary attributes."""
         super().__init__(params)
-        self.econ_type = econ_type
+        self.econ_type = econ_type.lower()
 
     def generate_components(self):
         """Initialize components of heat pump."""
@@ -55,92 +48,101 @@ class HeatPumpPC(HeatPumpBase):
         self.comps['comp2'] = Compressor('Compressor 2')
         self.comps['merge'] = Merge('Compressor Merge')
 
-        if self.econ_type.lower() == 'closed':
-            self.comps['split'] = Splitter('Condensate Splitter')
-            self.comps['econ'] = HeatExchanger('Economizer')
-        elif self.econ_type.lower() == 'open':
-            self.comps['econ'] = DropletSeparator('Economizer')
-        else:
+        econ_comps = {
+            'closed': {
+                'split': (Splitter, 'Condensate Splitter'),
+                'econ': (HeatExchanger, 'Economizer')
+                },
+            'open': {
+                'econ': (DropletSeparator, 'Economizer')
+                }
+            }
+        if self.econ_type not in econ_comps:
             raise ValueError(
                 f"Parameter '{self.econ_type}' is not a valid econ_type. "
                 + "Supported values are 'open' and 'closed'."
                 )
+        for key, (comp_type, label) in econ_comps[self.econ_type].items():
+            self.comps[key] = comp_type(label)
 
     def generate_connections(self):
         """Initialize and add connections and busses to network."""
+        comps = self.comps
+        conns = self.conns
+
         # Connections
-        self.conns['A0'] = Connection(
-            self.comps['cond'], 'out1', self.comps['cc'], 'in1', 'A0'
+        conns['A0'] = Connection(
+            comps['cond'], 'out1', comps['cc'], 'in1', 'A0'
             )
-        self.conns['A3'] = Connection(
-            self.comps['econ'], 'out1', self.comps['evap_valve'], 'in1', 'A3'
+        conns['A3'] = Connection(
+            comps['econ'], 'out1', comps['evap_valve'], 'in1', 'A3'
             )
-        self.conns['A4'] = Connection(
-            self.comps['evap_valve'], 'out1', self.comps['evap'], 'in2', 'A4'
+        conns['A4'] = Connection(
+            comps['evap_valve'], 'out1', comps['evap'], 'in2', 'A4'
             )
-        self.conns['A5'] = Connection(
-            self.comps['evap'], 'out2', self.comps['comp1'], 'in1', 'A5'
+        conns['A5'] = Connection(
+            comps['evap'], 'out2', comps['comp1'], 'in1', 'A5'
             )
-        self.conns['A6'] = Connection(
-            self.comps['comp1'], 'out1', self.comps['merge'], 'in1', 'A6'
+        conns['A6'] = Connection(
+            comps['comp1'], 'out1', comps['merge'], 'in1', 'A6'
             )
-        self.conns['A7'] = Connection(
-            self.comps['merge'], 'out1', self.comps['cond'], 'in1', 'A7'
+        conns['A7'] = Connection(
+            comps['merge'], 'out1', comps['cond'], 'in1', 'A7'
             )
-        self.conns['A8'] = Connection(
-            self.comps['econ'], 'out2', self.comps['comp2'], 'in1', 'A8'
+        conns['A8'] = Connection(
+            comps['econ'], 'out2', comps['comp2'], 'in1', 'A8'
             )
-        self.conns['A9'] = Connection(
-            self.comps['comp2'], 'out1', self.comps['merge'], 'in2', 'A9'
+        conns['A9'] = Connection(
+            comps['comp2'], 'out1', comps['merge'], 'in2', 'A9'
             )
 
-        self.conns['B1'] = Connection(
-            self.comps['hs_ff'], 'out1', self.comps['evap'], 'in1', 'B1'
+        conns['B1'] = Connection(
+            comps['hs_ff'], 'out1', comps['evap'], 'in1', 'B1'
             )
-        self.conns['B2'] = Connection(
-            self.comps['evap'], 'out1', self.comps['hs_pump'], 'in1', 'B2'
+        conns['B2'] = Connection(
+            comps['evap'], 'out1', comps['hs_pump'], 'in1', 'B2'
             )
-        self.conns['B3'] = Connection(
-            self.comps['hs_pump'], 'out1', self.comps['hs_bf'], 'in1', 'B3'
+        conns['B3'] = Connection(
+            comps['hs_pump'], 'out1', comps['hs_bf'], 'in1', 'B3'
             )
 
-        self.conns['C0'] = Connection(
-            self.comps['cons'], 'out1', self.comps['cons_cc'], 'in1', 'C0'
+        conns['C0'] = Connection(
+            comps['cons'], 'out1', comps['cons_cc'], 'in1', 'C0'
             )
-        self.conns['C1'] = Connection(
-            self.comps['cons_cc'], 'out1', self.comps['cons_pump'], 'in1', 'C1'
+        conns['C1'] = Connection(
+            comps['cons_cc'], 'out1', comps['cons_pump'], 'in1', 'C1'
             )
-        self.conns['C2'] = Connection(
-            self.comps['cons_pump'], 'out1', self.comps['cond'], 'in2', 'C2'
+        conns['C2'] = Connection(
+            comps['cons_pump'], 'out1', comps['cond'], 'in2', 'C2'
             )
-        self.conns['C3'] = Connection(
-            self.comps['cond'], 'out2', self.comps['cons'], 'in1', 'C3'
+        conns['C3'] = Connection(
+            comps['cond'], 'out2', comps['cons'], 'in1', 'C3'
             )
 
-        if self.econ_type.lower() == 'closed':
-            self.conns['A1'] = Connection(
-                self.comps['cc'], 'out1', self.comps['split'], 'in1', 'A1'
+        if self.econ_type == 'closed':
+            conns['A1'] = Connection(
+                comps['cc'], 'out1', comps['split'], 'in1', 'A1'
                 )
-            self.conns['A2'] = Connection(
-                self.comps['split'], 'out1', self.comps['econ'], 'in1', 'A2'
+            conns['A2'] = Connection(
+                comps['split'], 'out1', comps['econ'], 'in1', 'A2'
                 )
-            self.conns['A10'] = Connection(
-                self.comps['split'], 'out2',
-                self.comps['mid_valve'], 'in1', 'A10'
+            conns['A10'] = Connection(
+                comps['split'], 'out2',
+                comps['mid_valve'], 'in1', 'A10'
                 )
-            self.conns['A11'] = Connection(
-                self.comps['mid_valve'], 'out1',
-                self.comps['econ'], 'in2', 'A11'
+            conns['A11'] = Connection(
+                comps['mid_valve'], 'out1',
+                comps['econ'], 'in2', 'A11'
                 )
-        elif self.econ_type.lower() == 'open':
-            self.conns['A1'] = Connection(
-                self.comps['cc'], 'out1', self.comps['mid_valve'], 'in1', 'A1'
+        elif self.econ_type == 'open':
+            conns['A1'] = Connection(
+                comps['cc'], 'out1', comps['mid_valve'], 'in1', 'A1'
                 )
-            self.conns['A2'] = Connection(
-                self.comps['mid_valve'], 'out1', self.comps['econ'], 'in1', 'A2'
+            conns['A2'] = Connection(
+                comps['mid_valve'], 'out1', comps['econ'], 'in1', 'A2'
                 )
 
-        self.nw.add_conns(*[conn for conn in self.conns.values()])
+        self.nw.add_conns(*conns.values())
 
         # Busses
         mot_x = np.array([
@@ -157,24 +159,24 @@ class HeatPumpPC(HeatPumpBase):
         mot = CharLine(x=mot_x, y=mot_y)
         self.busses['power input'] = Bus('power input')
         self.busses['power input'].add_comps(
-            {'comp': self.comps['comp1'], 'char': mot, 'base': 'bus'},
-            {'comp': self.comps['comp2'], 'char': mot, 'base': 'bus'},
-            {'comp': self.comps['hs_pump'], 'char': mot, 'base': 'bus'},
-            {'comp': self.comps['cons_pump'], 'char': mot, 'base': 'bus'}
+            {'comp': comps['comp1'], 'char': mot, 'base': 'bus'},
+            {'comp': comps['comp2'], 'char': mot, 'base': 'bus'},
+            {'comp': comps['hs_pump'], 'char': mot, 'base': 'bus'},
+            {'comp': comps['cons_pump'], 'char': mot, 'base': 'bus'}
             )
 
         self.busses['heat input'] = Bus('heat input')
         self.busses['heat input'].add_comps(
-            {'comp': self.comps['hs_ff'], 'base': 'bus'},
-            {'comp': self.comps['hs_bf'], 'base': 'component'}
+            {'comp': comps['hs_ff'], 'base': 'bus'},
+            {'comp': comps['hs_bf'], 'base': 'component'}
             )
 
         self.busses['heat output'] = Bus('heat output')
         self.busses['heat output'].add_comps(
-            {'comp': self.comps['cons'], 'base': 'component'}
+            {'comp': comps['cons'], 'base': 'component'}
             )
 
-        self.nw.add_busses(*[bus for bus in self.busses.values()])
+        self.nw.add_busses(*self.busses.values())
 
     def init_simulation(self, **kwargs):
         """Perform initial parametrization with starting values."""
@@ -196,7 +198,7 @@ class HeatPumpPC(HeatPumpBase):
             pr=self.params['cons']['pr'], Q=self.params['cons']['Q']
             , dissipative=False
             )
-        if self.econ_type.lower() == 'closed':
+        if self.econ_type == 'closed':
             self.comps['econ'].set_attr(
                 pr1=self.params['econ']['pr1'], pr2=self.params['econ']['pr2']
                 )
@@ -211,7 +213,7 @@ class HeatPumpPC(HeatPumpBase):
         self.conns['A5'].set_attr(x=self.params['A5']['x'], p=p_evap)
         self.conns['A0'].set_attr(p=p_cond, fluid=self.fluid_vec_wf)
         self.conns['A8'].set_attr(p=p_mid)
-        if self.econ_type.lower() == 'closed':
+        if self.econ_type == 'closed':
             self.conns['A8'].set_attr(x=1)
             self.conns['A2'].set_attr(
                 m=Ref(self.conns['A0'], 0.9, 0)
@@ -330,20 +332,44 @@ class HeatPumpPC(HeatPumpBase):
             index=multiindex, columns=['Q', 'P', 'COP', 'residual']
             )
 
+        initpath = os.path.join(
+            __file__, '..', 'stable', f'{self.subdirname}_init'
+            )
+        if log_simulations:
+            logdirpath = os.path.join(__file__, '..', 'output', 'logging')
+            if not os.path.exists(logdirpath):
+                os.mkdir(logdirpath)
+            logpath = os.path.join(
+                logdirpath, f'{self.subdirname}_offdesign_log.csv'
+                )
+
+        # The init state only exists once a full load point converged
+        init_saved = False
+
+        # Resolve objects accessed in every iteration beforehand
+        A0, A8, B1, B2, C3 = (
+            self.conns[label] for label in ('A0', 'A8', 'B1', 'B2', 'C3')
+            )
+        cons = self.comps['cons']
+        heat_output = self.busses['heat output']
+        power_input = self.busses['power input']
+
         for T_hs_ff in self.T_hs_ff_stablerange:
-            self.conns['B1'].set_attr(T=T_hs_ff)
+            T_hs_ff_inrange = T_hs_ff in self.T_hs_ff_range
+            B1.set_attr(T=T_hs_ff)
             if T_hs_ff <= 7:
-                self.conns['B2'].set_attr(T=2)
+                B2.set_attr(T=2)
             else:
-                self.conns['B2'].set_attr(T=T_hs_ff-deltaT_hs)
+                B2.set_attr(T=T_hs_ff-deltaT_hs)
 
             for T_cons_ff in self.T_cons_ff_stablerange:
-                self.conns['C3'].set_attr(T=T_cons_ff)
+                T_cons_ff_inrange = T_cons_ff in self.T_cons_ff_range
+                C3.set_attr(T=T_cons_ff)
 
                 _, _, p_mid = self.get_pressure_levels(
                     T_evap=T_hs_ff, T_cond=T_cons_ff
                     )
-                self.conns['A8'].set_attr(p=p_mid)
+                A8.set_attr(p=p_mid)
                 for pl in self.pl_stablerange[::-1]:
                     print(
                         f'### Temp. HS = {T_hs_ff} °C, Temp. Cons = '
@@ -354,17 +380,16 @@ class HeatPumpPC(HeatPumpBase):
                         (T_cons_ff != self.T_cons_ff_range[0])
                         and (pl == self.pl_range[-1])
                         )
-                    if no_init_path:
-                        self.init_path = os.path.join(
-                            __file__, '..', 'stable', f'{self.subdirname}_init'
-                         )
+                    if no_init_path and init_saved:
+                        self.init_path = initpath
 
-                    self.comps['cons'].set_attr(Q=None)
-                    self.conns['A0'].set_attr(m=pl*self.m_design)
+                    cons.set_attr(Q=None)
+                    A0.set_attr(m=pl*self.m_design)
 
                     try:
                         self.nw.solve(
-                            'offdesign', design_path=self.design_path
+                            'offdesign', design_path=self.design_path,
+                            init_path=self.init_path
                             )
                         failed = False
                     except ValueError:
@@ -372,14 +397,6 @@ class HeatPumpPC(HeatPumpBase):
 
                     # Logging simulation
                     if log_simulations:
-                        logdirpath = os.path.join(
-                            __file__, '..', 'output', 'logging'
-                            )
-                        if not os.path.exists(logdirpath):
-                            os.mkdir(logdirpath)
-                        logpath = os.path.join(
-                            logdirpath, f'{self.subdirname}_offdesign_log.csv'
-                            )
                         timestamp = datetime.fromtimestamp(time()).strftime(
                             '%H:%M:%S'
                             )
@@ -400,14 +417,12 @@ class HeatPumpPC(HeatPumpBase):
                                 file.write(log_entry)
 
                     if pl == self.pl_range[-1] and self.nw.res[-1] < 1e-3:
-                        self.nw.save(os.path.join(
-                            __file__, '..', 'stable', f'{self.subdirname}_init'
-                         ))
+                        self.nw.save(initpath)
+                        init_saved = True
 
                     inranges = (
-                        (T_hs_ff in self.T_hs_ff_range)
-                        & (T_cons_ff in self.T_cons_ff_range)
-                        & (pl in self.pl_range)
+                        T_hs_ff_inrange and T_cons_ff_inrange
+                        and pl in self.pl_range
                         )
                     idx = (T_hs_ff, T_cons_ff, pl)
                     if inranges:
@@ -423,10 +438,10 @@ class HeatPumpPC(HeatPumpBase):
                                 results_offdesign.loc[idx, 'P'] = np.nan
                             else:
                                 results_offdesign.loc[idx, 'Q'] = abs(
-                                    self.busses['heat output'].P.val * 1e-6
+                                    heat_output.P.val * 1e-6
                                     )
                                 results_offdesign.loc[idx, 'P'] = (
-                                    self.busses['power input'].P.val * 1e-6
+                                    power_input.P.val * 1e-6
                                     )
 
                             results_offdesign.loc[idx, 'COP'] = (
@@ -445,256 +460,16 @@ class HeatPumpPC(HeatPumpBase):
 
         self.df_to_array(results_offdesign)
 
-    def calc_partload_char(self, **kwargs):
-        """
-        Interpolate data points of heat output and power input.
-
-        Return functions to interpolate values heat output and
-        power input based on the partload and the feed flow
-        temperatures of the heat source and sink. If there is
-        no data given through keyword arguments, the instances
-        attributes will be searched for the necessary data.
-
-        Parameters
-        ----------
-        kwargs : dict
-            Necessary data is:
-                Q_array : 3d array
-                P_array : 3d array
-                pl_range : 1d array
-                T_hs_ff_range : 1d array
-                T_cons_ff_range : 1d array
-        """
-        necessary_params = [
-            'Q_array', 'P_array', 'pl_range', 'T_hs_ff_range',
-            'T_cons_ff_range'
-            ]
-        if len(kwargs):
-            for nec_param in necessary_params:
-                if nec_param not in kwargs:
-                    raise KeyError(
-                        f'Necessary parameter {nec_param} not '
-                        + 'in kwargs. The necessary parameters'
-                        + f' are: {necessary_params}'
-                        )
-            Q_array = np.asarray(kwargs['Q_array'])
-            P_array = np.asarray(kwargs['P_array'])
-            pl_range = kwargs['pl_range']
-            T_hs_ff_range = kwargs['T_hs_ff_range']
-            T_cons_ff_range = kwargs['T_cons_ff_range']
-        else:
-            for nec_param in necessary_params:
-                if nec_param not in self.__dict__:
-                    raise AttributeError(
-                        f'Necessary parameter {nec_param} can '
-                        + 'not be found in the instances '
-                        + 'attributes. Please make sure to '
-                        + 'perform the offdesign_simulation '
-                        + 'method or provide the necessary '
-                        + 'parameters as kwargs. These are: '
-                        + f'{necessary_params}'
-                        )
-            Q_array = np.asarray(self.Q_array)
-            P_array = np.asarray(self.P_array)
-            pl_range = self.pl_range
-            T_hs_ff_range = self.T_hs_ff_range
-            T_cons_ff_range = self.T_cons_ff_range
-
-        pl_step = 0.01
-        T_hs_ff_step = 1
-        T_cons_ff_step = 1
-
-        pl_fullrange = np.arange(
-            pl_range[0],
-            pl_range[-1]+pl_step,
-            pl_step
-            )
-        T_hs_ff_fullrange = np.arange(
-            T_hs_ff_range[0], T_hs_ff_range[-1]+T_hs_ff_step, T_hs_ff_step
-            )
-        T_cons_ff_fullrange = np.arange(
-            T_cons_ff_range[0], T_cons_ff_range[-1]+T_cons_ff_step,
-            T_cons_ff_step
-            )
-
-        multiindex = pd.MultiIndex.from_product(
-                        [T_hs_ff_fullrange, T_cons_ff_fullrange, pl_fullrange],
-                        names=['T_hs_ff', 'T_cons_ff', 'pl']
-                        )
-
-        partload_char = pd.DataFrame(
-            index=multiindex, columns=['Q', 'P', 'COP']
-            )
-
-        for T_hs_ff in T_hs_ff_fullrange:
-            for T_cons_ff in T_cons_ff_fullrange:
-                for pl in pl_fullrange:
-                    partload_char.loc[(T_hs_ff, T_cons_ff, pl), 'Q'] = abs(
-                        interpn(
-                            (T_hs_ff_range, T_cons_ff_range, pl_range),
-                            Q_array,
-                            (round(T_hs_ff, 3), round(T_cons_ff, 3),
-                             round(pl, 3)),
-                            bounds_error=False
-                            )[0]
-                        )
-                    partload_char.loc[(T_hs_ff, T_cons_ff, pl), 'P'] = interpn(
-                        (T_hs_ff_range, T_cons_ff_range, pl_range),
-                        P_array,
-                        (round(T_hs_ff, 3), round(T_cons_ff, 3), round(pl, 3)),
-                        bounds_error=False
-                        )[0]
-                    partload_char.loc[(T_hs_ff, T_cons_ff, pl), 'COP'] = (
-                        partload_char.loc[(T_hs_ff, T_cons_ff, pl), 'Q']
-                        / partload_char.loc[(T_hs_ff, T_cons_ff, pl), 'P']
-                        )
-
-        return partload_char
-
-    def linearize_partload_char(self, partload_char, variable='P',
-                                line_type='offset', regression_type='OLS',
-                                normalize=None):
-        """
-        Linearize partload characteristic for usage in MILP problems.
-
-        Parameters
-        ----------
-        partload_char : pd.DataFrame
-            DataFrame of the full partload characteristic containing 'Q', 'P'
-            and 'COP' with a MultiIndex of the three variables 'T_hs_ff',
-            'T_cons_ff' and 'pl'.
-
-        variable : str
-            The variable 'x' in the equation 'y = m * x + b'. Either 'P' or 'Q'.
-            Defaults to 'P' if it is not set.
-
-        line_type : str
-            Type of linear model to generate. Options are 'origin' for a line
-            through the origin or 'offset' for mixed integer offset model.
-            Defaults to 'offset' if it is not set.
-
-        regression_type : str
-            Type of regression method to use for linearization of the partload
-            characteristic. Options are 'OLS' for the method of ordinary least
-            squares or 'MinMax' for a line from the minimum to the maximum
-            value.
-            Defaults to 'OLS' if it is not set.
-
-        normalize : dict
-            Dictionairy containing the keys 'T_hs_ff' and 'T_cons_ff'. These
-            values are interpreted as the nominal operating temperatures. All
-            linear parameters are normalized to the chosen variable at this
-            operating point.
-            Defaults to None and therefore no normalization if it is not set.
-        """
-        cols = [f'{variable}_max', f'{variable}_min']
-        if line_type == 'origin':
-            cols += ['COP']
-        elif line_type == 'offset':
-            cols += ['c_1', 'c_0']
-
-        T_hs_ff_range = set(
-            partload_char.index.get_level_values('T_hs_ff')
-            )
-        T_cons_ff_range = set(
-            partload_char.index.get_level_values('T_cons_ff')
-            )
-
-        multiindex = pd.MultiIndex.from_product(
-            [T_hs_ff_range, T_cons_ff_range],
-            names=['T_hs_ff', 'T_cons_ff']
-            )
-        linear_model = pd.DataFrame(index=multiindex, columns=cols)
-
-        if variable == 'P':
-            resp_variable = 'Q'
-        elif variable == 'Q':
-            resp_variable = 'P'
-        else:
-            raise ValueError(
-                f"Argument {variable} for parameter 'variable' is not valid."
-                + "Choose either 'P' or 'Q'."
-                )
-
-        for T_hs_ff in T_hs_ff_range:
-            for T_cons_ff in T_cons_ff_range:
-                idx = (T_hs_ff, T_cons_ff)
-                linear_model.loc[idx, f'{variable}_max'] = (
-                    partload_char.loc[idx, variable].max()
-                    )
-                linear_model.loc[idx, f'{variable}_min'] = (
-                    partload_char.loc[idx, variable].min()
-                    )
-                if regression_type == 'MinMax':
-                    if line_type == 'origin':
-                        linear_model.loc[idx, 'COP'] = (
-                            partload_char.loc[idx, 'Q'].max()
-                            / partload_char.loc[idx, 'P'].max()
-                            )
-                    elif line_type == 'offset':
-                        linear_model.loc[idx, 'c_1'] = (
-                            (partload_char.loc[idx, 'Q'].max()
-                             - partload_char.loc[idx, 'Q'].min())
-                            / (partload_char.loc[idx, 'P'].max()
-                               - partload_char.loc[idx, 'P'].min())
-                            )
-                        linear_model.loc[idx, 'c_0'] = (
-                            partload_char.loc[idx, 'Q'].max()
-                            - partload_char.loc[idx, 'P'].max()
-                            * linear_model.loc[idx, 'c_1']
-                            )
-                elif regression_type == 'OLS':
-                    regressor = partload_char.loc[idx, variable].to_numpy()
-                    regressor = regressor.reshape(-1, 1)
-                    response = partload_char.loc[idx, resp_variable].to_numpy()
-                    if line_type == 'origin':
-                        LinReg = LinearRegression(fit_intercept=False).fit(
-                            regressor, response
-                            )
-                        linear_model.loc[idx, 'COP'] = LinReg.coef_[0]
-                    elif line_type == 'offset':
-                        LinReg = LinearRegression().fit(regressor, response)
-                        linear_model.loc[idx, 'c_1'] = LinReg.coef_[0]
-                        linear_model.loc[idx, 'c_0'] = LinReg.intercept_
-
-        if normalize:
-            variable_nom = partload_char.loc[
-                (np.round(normalize['T_hs_ff'], 3),
-                 np.round(normalize['T_cons_ff'], 3)),
-                variable
-                ].max()
-
-            linear_model[f'{variable}_max'] /= variable_nom
-            linear_model[f'{variable}_min'] /= variable_nom
-            if line_type == 'offset':
-                linear_model['c_0'] /= variable_nom
-                linear_model['c_1'] /= variable_nom
-
-        return linear_model
-
-    def arrange_char_timeseries(self, linear_model, temp_ts):
+    def arrange_char_timeseries(self, linear_model, temp_ts, clip=False):
         """
         Arrange a timeseries of the characteristics based on temperature data.
 
-        Parameters
-        ----------
-        linear_model : pd.DataFrame
-            DataFrame of the linearized partload characteristic with a
-            MultiIndex of the three variables 'T_hs_ff' and 'T_cons_ff'.
-
-        temp_ts : pd.DataFrame
-            Timeseries of 'T_hs_ff' and 'T_cons_ff' as they occur in the period
-            observed.
+        Out of bounds temperatures raise a KeyError by default, see
+        HeatPumpBase.arrange_char_timeseries.
         """
-        char_ts = pd.DataFrame(
-            index=temp_ts.index, columns=linear_model.columns
+        return super().arrange_char_timeseries(
+            linear_model, temp_ts, clip=clip
             )
-        for i in temp_ts.index:
-            char_ts.loc[i, :] = linear_model.loc[
-                (temp_ts.loc[i, 'T_hs_ff'], temp_ts.loc[i, 'T_cons_ff']), :
-                ]
-
-        return char_ts
 
     def get_plotting_states(self, **kwargs):
         """Generate data of states to plot in state diagram."""
@@ -738,23 +513,7 @@ class HeatPumpPC(HeatPumpBase):
              self.comps['comp2'].get_plotting_data()[1]}
         )
 
-        for comp in data:
-            if 'Compressor' in comp:
-                data[comp]['starting_point_value'] *= 0.999999
+        for comp in ('comp1', 'comp2'):
+            data[self.comps[comp].label]['starting_point_value'] *= 0.999999
 
         return data
-
-    def perform_exergy_analysis(self, print_results=False, **kwargs):
-        """Perform exergy analysis."""
-        self.ean = ExergyAnalysis(
-            self.nw,
-            E_F=[self.busses['power input'], self.busses['heat input']],
-            E_P=[self.busses['heat output']]
-            )
-        self.ean.analyse(
-            pamb=self.params['ambient']['p'], Tamb=self.params['ambient']['T']
-            )
-        if print_results:
-            self.ean.print_results(**kwargs)
-
-        self.epsilon = self.ean.network_data['epsilon']
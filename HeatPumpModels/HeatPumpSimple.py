@@ -1,18 +1,13 @@
-import json
 import os
 from datetime import datetime
 from time import time
 
 import numpy as np
 import pandas as pd
-from CoolProp.CoolProp import PropsSI as PSI
-from scipy.interpolate import interpn
-from sklearn.linear_model import LinearRegression
 from tespy.components import (Compressor, Condenser, CycleCloser,
                               HeatExchanger, HeatExchangerSimple, Pump, Sink,
                               Source, Valve)
 from tespy.connections import Bus, Connection
-from tespy.tools import ExergyAnalysis
 from tespy.tools.characteristics import CharLine
 from tespy.tools.characteristics import load_default_char as ldc
 
@@ -46,47 +41,50 @@ class HeatPumpSimple(HeatPumpBase):
 
     def generate_connections(self):
         """Initialize and add connections and busses to network."""
+        comps = self.comps
+        conns = self.conns
+
         # Connections
-        self.conns['A0'] = Connection(
-            self.comps['cond'], 'out1', self.comps['cc'], 'in1', 'A0'
+        conns['A0'] = Connection(
+            comps['cond'], 'out1', comps['cc'], 'in1', 'A0'
             )
-        self.conns['A1'] = Connection(
-            self.comps['cc'], 'out1', self.comps['valve'], 'in1', 'A1'
+        conns['A1'] = Connection(
+            comps['cc'], 'out1', comps['valve'], 'in1', 'A1'
             )
-        self.conns['A2'] = Connection(
-            self.comps['valve'], 'out1', self.comps['evap'], 'in2', 'A2'
+        conns['A2'] = Connection(
+            comps['valve'], 'out1', comps['evap'], 'in2', 'A2'
             )
-        self.conns['A3'] = Connection(
-            self.comps['evap'], 'out2', self.comps['comp'], 'in1', 'A3'
+        conns['A3'] = Connection(
+            comps['evap'], 'out2', comps['comp'], 'in1', 'A3'
             )
-        self.conns['A4'] = Connection(
-            self.comps['comp'], 'out1', self.comps['cond'], 'in1', 'A4'
+        conns['A4'] = Connection(
+            comps['comp'], 'out1', comps['cond'], 'in1', 'A4'
             )
 
-        self.conns['B1'] = Connection(
-            self.comps['hs_ff'], 'out1', self.comps['evap'], 'in1', 'B1'
+        conns['B1'] = Connection(
+            comps['hs_ff'], 'out1', comps['evap'], 'in1', 'B1'
             )
-        self.conns['B2'] = Connection(
-            self.comps['evap'], 'out1', self.comps['hs_pump'], 'in1', 'B2'
+        conns['B2'] = Connection(
+            comps['evap'], 'out1', comps['hs_pump'], 'in1', 'B2'
             )
-        self.conns['B3'] = Connection(
-            self.comps['hs_pump'], 'out1', self.comps['hs_bf'], 'in1', 'B3'
+        conns['B3'] = Connection(
+            comps['hs_pump'], 'out1', comps['hs_bf'], 'in1', 'B3'
             )
 
-        self.conns['C0'] = Connection(
-            self.comps['cons'], 'out1', self.comps['cons_cc'], 'in1', 'C0'
+        conns['C0'] = Connection(
+            comps['cons'], 'out1', comps['cons_cc'], 'in1', 'C0'
             )
-        self.conns['C1'] = Connection(
-            self.comps['cons_cc'], 'out1', self.comps['cons_pump'], 'in1', 'C1'
+        conns['C1'] = Connection(
+            comps['cons_cc'], 'out1', comps['cons_pump'], 'in1', 'C1'
             )
-        self.conns['C2'] = Connection(
-            self.comps['cons_pump'], 'out1', self.comps['cond'], 'in2', 'C2'
+        conns['C2'] = Connection(
+            comps['cons_pump'], 'out1', comps['cond'], 'in2', 'C2'
             )
-        self.conns['C3'] = Connection(
-            self.comps['cond'], 'out2', self.comps['cons'], 'in1', 'C3'
+        conns['C3'] = Connection(
+            comps['cond'], 'out2', comps['cons'], 'in1', 'C3'
             )
 
-        self.nw.add_conns(*[conn for conn in self.conns.values()])
+        self.nw.add_conns(*conns.values())
 
         # Busses
         mot_x = np.array([
@@ -103,23 +101,23 @@ class HeatPumpSimple(HeatPumpBase):
         mot = CharLine(x=mot_x, y=mot_y)
         self.busses['power input'] = Bus('power input')
         self.busses['power input'].add_comps(
-            {'comp': self.comps['comp'], 'char': mot, 'base': 'bus'},
-            {'comp': self.comps['hs_pump'], 'char': mot, 'base': 'bus'},
-            {'comp': self.comps['cons_pump'], 'char': mot, 'base': 'bus'}
+            {'comp': comps['comp'], 'char': mot, 'base': 'bus'},
+            {'comp': comps['hs_pump'], 'char': mot, 'base': 'bus'},
+            {'comp': comps['cons_pump'], 'char': mot, 'base': 'bus'}
             )
 
         self.busses['heat input'] = Bus('heat input')
         self.busses['heat input'].add_comps(
-            {'comp': self.comps['hs_ff'], 'base': 'bus'},
-            {'comp': self.comps['hs_bf'], 'base': 'component'}
+            {'comp': comps['hs_ff'], 'base': 'bus'},
+            {'comp': comps['hs_bf'], 'base': 'component'}
             )
 
         self.busses['heat output'] = Bus('heat output')
         self.busses['heat output'].add_comps(
-            {'comp': self.comps['cons'], 'base': 'component'}
+            {'comp': comps['cons'], 'base': 'component'}
             )
 
-        self.nw.add_busses(*[bus for bus in self.busses.values()])
+        self.nw.add_busses(*self.busses.values())
 
     def init_simulation(self, **kwargs):
         """Perform initial parametrization with starting values."""
@@ -250,15 +248,39 @@ class HeatPumpSimple(HeatPumpBase):
             index=multiindex, columns=['Q', 'P', 'COP', 'residual']
             )
 
+        initpath = os.path.join(
+            __file__, '..', 'stable', f'{self.subdirname}_init'
+            )
+        if log_simulations:
+            logdirpath = os.path.join(__file__, '..', 'output', 'logging')
+            if not os.path.exists(logdirpath):
+                os.mkdir(logdirpath)
+            logpath = os.path.join(
+                logdirpath, f'{self.subdirname}_offdesign_log.csv'
+                )
+
+        # The init state only exists once a full load point converged
+        init_saved = False
+
+        # Resolve objects accessed in every iteration beforehand
+        A0, B1, B2, C3 = (
+            self.conns[label] for label in ('A0', 'B1', 'B2', 'C3')
+            )
+        cons = self.comps['cons']
+        heat_output = self.busses['heat output']
+        power_input = self.busses['power input']
+
         for T_hs_ff in self.T_hs_ff_stablerange:
-            self.conns['B1'].set_attr(T=T_hs_ff)
+            T_hs_ff_inrange = T_hs_ff in self.T_hs_ff_range
+            B1.set_attr(T=T_hs_ff)
             if T_hs_ff <= 7:
-                self.conns['B2'].set_attr(T=2)
+                B2.set_attr(T=2)
             else:
-                self.conns['B2'].set_attr(T=T_hs_ff-deltaT_hs)
+                B2.set_attr(T=T_hs_ff-deltaT_hs)
 
             for T_cons_ff in self.T_cons_ff_stablerange:
-                self.conns['C3'].set_attr(T=T_cons_ff)
+                T_cons_ff_inrange = T_cons_ff in self.T_cons_ff_range
+                C3.set_attr(T=T_cons_ff)
 
                 for pl in self.pl_stablerange[::-1]:
                     print(
@@ -270,17 +292,16 @@ class HeatPumpSimple(HeatPumpBase):
                         (T_cons_ff != self.T_cons_ff_range[0])
                         and (pl == self.pl_range[-1])
                         )
-                    if no_init_path:
-                        self.init_path = os.path.join(
-                            __file__, '..', 'stable', f'{self.subdirname}_init'
-                         )
+                    if no_init_path and init_saved:
+                        self.init_path = initpath
 
-                    self.comps['cons'].set_attr(Q=None)
-                    self.conns['A0'].set_attr(m=pl*self.m_design)
+                    cons.set_attr(Q=None)
+                    A0.set_attr(m=pl*self.m_design)
 
                     try:
                         self.nw.solve(
-                            'offdesign', design_path=self.design_path
+                            'offdesign', design_path=self.design_path,
+                            init_path=self.init_path
                             )
                         failed = False
                     except ValueError:
@@ -288,14 +309,6 @@ class HeatPumpSimple(HeatPumpBase):
 
                     # Logging simulation
                     if log_simulations:
-                        logdirpath = os.path.join(
-                            __file__, '..', 'output', 'logging'
-                            )
-                        if not os.path.exists(logdirpath):
-                            os.mkdir(logdirpath)
-                        logpath = os.path.join(
-                            logdirpath, f'{self.subdirname}_offdesign_log.csv'
-                            )
                         timestamp = datetime.fromtimestamp(time()).strftime(
                             '%H:%M:%S'
                             )
@@ -316,14 +329,12 @@ class HeatPumpSimple(HeatPumpBase):
                                 file.write(log_entry)
 
                     if pl == self.pl_range[-1] and self.nw.res[-1] < 1e-3:
-                        self.nw.save(os.path.join(
-                            __file__, '..', 'stable', f'{self.subdirname}_init'
-                         ))
+                        self.nw.save(initpath)
+                        init_saved = True
 
                     inranges = (
-                        (T_hs_ff in self.T_hs_ff_range)
-                        & (T_cons_ff in self.T_cons_ff_range)
-                        & (pl in self.pl_range)
+                        T_hs_ff_inrange and T_cons_ff_inrange
+                        and pl in self.pl_range
                         )
                     idx = (T_hs_ff, T_cons_ff, pl)
                     if inranges:
@@ -339,10 +350,10 @@ class HeatPumpSimple(HeatPumpBase):
                                 results_offdesign.loc[idx, 'P'] = np.nan
                             else:
                                 results_offdesign.loc[idx, 'Q'] = abs(
-                                    self.busses['heat output'].P.val * 1e-6
+                                    heat_output.P.val * 1e-6
                                     )
                                 results_offdesign.loc[idx, 'P'] = (
-                                    self.busses['power input'].P.val * 1e-6
+                                    power_input.P.val * 1e-6
                                     )
 
                             results_offdesign.loc[idx, 'COP'] = (
@@ -361,273 +372,6 @@ class HeatPumpSimple(HeatPumpBase):
 
         self.df_to_array(results_offdesign)
 
-    def calc_partload_char(self, **kwargs):
-        """
-        Interpolate data points of heat output and power input.
-
-        Return functions to interpolate values heat output and
-        power input based on the partload and the feed flow
-        temperatures of the heat source and sink. If there is
-        no data given through keyword arguments, the instances
-        attributes will be searched for the necessary data.
-
-        Parameters
-        ----------
-        kwargs : dict
-            Necessary data is:
-                Q_array : 3d array
-                P_array : 3d array
-                pl_range : 1d array
-                T_hs_ff_range : 1d array
-                T_cons_ff_range : 1d array
-        """
-        necessary_params = [
-            'Q_array', 'P_array', 'pl_range', 'T_hs_ff_range',
-            'T_cons_ff_range'
-            ]
-        if len(kwargs):
-            for nec_param in necessary_params:
-                if nec_param not in kwargs:
-                    raise KeyError(
-                        f'Necessary parameter {nec_param} not '
-                        + 'in kwargs. The necessary parameters'
-                        + f' are: {necessary_params}'
-                        )
-            Q_array = np.asarray(kwargs['Q_array'])
-            P_array = np.asarray(kwargs['P_array'])
-            pl_range = kwargs['pl_range']
-            T_hs_ff_range = kwargs['T_hs_ff_range']
-            T_cons_ff_range = kwargs['T_cons_ff_range']
-        else:
-            for nec_param in necessary_params:
-                if nec_param not in self.__dict__:
-                    raise AttributeError(
-                        f'Necessary parameter {nec_param} can '
-                        + 'not be found in the instances '
-                        + 'attributes. Please make sure to '
-                        + 'perform the offdesign_simulation '
-                        + 'method or provide the necessary '
-                        + 'parameters as kwargs. These are: '
-                        + f'{necessary_params}'
-                        )
-            Q_array = np.asarray(self.Q_array)
-            P_array = np.asarray(self.P_array)
-            pl_range = self.pl_range
-            T_hs_ff_range = self.T_hs_ff_range
-            T_cons_ff_range = self.T_cons_ff_range
-
-        pl_step = 0.01
-        T_hs_ff_step = 1
-        T_cons_ff_step = 1
-
-        pl_fullrange = np.arange(
-            pl_range[0],
-            pl_range[-1]+pl_step,
-            pl_step
-            )
-        T_hs_ff_fullrange = np.arange(
-            T_hs_ff_range[0], T_hs_ff_range[-1]+T_hs_ff_step, T_hs_ff_step
-            )
-        T_cons_ff_fullrange = np.arange(
-            T_cons_ff_range[0], T_cons_ff_range[-1]+T_cons_ff_step,
-            T_cons_ff_step
-            )
-
-        multiindex = pd.MultiIndex.from_product(
-                        [T_hs_ff_fullrange, T_cons_ff_fullrange, pl_fullrange],
-                        names=['T_hs_ff', 'T_cons_ff', 'pl']
-                        )
-
-        partload_char = pd.DataFrame(
-            index=multiindex, columns=['Q', 'P', 'COP']
-            )
-
-        for T_hs_ff in T_hs_ff_fullrange:
-            for T_cons_ff in T_cons_ff_fullrange:
-                for pl in pl_fullrange:
-                    partload_char.loc[(T_hs_ff, T_cons_ff, pl), 'Q'] = abs(
-                        interpn(
-                            (T_hs_ff_range, T_cons_ff_range, pl_range),
-                            Q_array,
-                            (round(T_hs_ff, 3), round(T_cons_ff, 3),
-                             round(pl, 3)),
-                            bounds_error=False
-                            )[0]
-                        )
-                    partload_char.loc[(T_hs_ff, T_cons_ff, pl), 'P'] = interpn(
-                        (T_hs_ff_range, T_cons_ff_range, pl_range),
-                        P_array,
-                        (round(T_hs_ff, 3), round(T_cons_ff, 3), round(pl, 3)),
-                        bounds_error=False
-                        )[0]
-                    partload_char.loc[(T_hs_ff, T_cons_ff, pl), 'COP'] = (
-                        partload_char.loc[(T_hs_ff, T_cons_ff, pl), 'Q']
-                        / partload_char.loc[(T_hs_ff, T_cons_ff, pl), 'P']
-                        )
-
-        return partload_char
-
-    def linearize_partload_char(self, partload_char, variable='P',
-                                line_type='offset', regression_type='OLS',
-                                normalize=None):
-        """
-        Linearize partload characteristic for usage in MILP problems.
-
-        Parameters
-        ----------
-        partload_char : pd.DataFrame
-            DataFrame of the full partload characteristic containing 'Q', 'P'
-            and 'COP' with a MultiIndex of the three variables 'T_hs_ff',
-            'T_cons_ff' and 'pl'.
-
-        variable : str
-            The variable 'x' in the equation 'y = m * x + b'. Either 'P' or 'Q'.
-            Defaults to 'P' if it is not set.
-
-        line_type : str
-            Type of linear model to generate. Options are 'origin' for a line
-            through the origin or 'offset' for mixed integer offset model.
-            Defaults to 'offset' if it is not set.
-
-        regression_type : str
-            Type of regression method to use for linearization of the partload
-            characteristic. Options are 'OLS' for the method of ordinary least
-            squares or 'MinMax' for a line from the minimum to the maximum
-            value.
-            Defaults to 'OLS' if it is not set.
-
-        normalize : dict
-            Dictionairy containing the keys 'T_hs_ff' and 'T_cons_ff'. These
-            values are interpreted as the nominal operating temperatures. All
-            linear parameters are normalized to the chosen variable at this
-            operating point.
-            Defaults to None and therefore no normalization if it is not set.
-        """
-        cols = [f'{variable}_max', f'{variable}_min']
-        if line_type == 'origin':
-            cols += ['COP']
-        elif line_type == 'offset':
-            cols += ['c_1', 'c_0']
-
-        T_hs_ff_range = set(
-            partload_char.index.get_level_values('T_hs_ff')
-            )
-        T_cons_ff_range = set(
-            partload_char.index.get_level_values('T_cons_ff')
-            )
-
-        multiindex = pd.MultiIndex.from_product(
-            [T_hs_ff_range, T_cons_ff_range],
-            names=['T_hs_ff', 'T_cons_ff']
-            )
-        linear_model = pd.DataFrame(index=multiindex, columns=cols)
-
-        if variable == 'P':
-            resp_variable = 'Q'
-        elif variable == 'Q':
-            resp_variable = 'P'
-        else:
-            raise ValueError(
-                f"Argument {variable} for parameter 'variable' is not valid."
-                + "Choose either 'P' or 'Q'."
-                )
-
-        for T_hs_ff in T_hs_ff_range:
-            for T_cons_ff in T_cons_ff_range:
-                idx = (T_hs_ff, T_cons_ff)
-                linear_model.loc[idx, f'{variable}_max'] = (
-                    partload_char.loc[idx, variable].max()
-                    )
-                linear_model.loc[idx, f'{variable}_min'] = (
-                    partload_char.loc[idx, variable].min()
-                    )
-                if regression_type == 'MinMax':
-                    if line_type == 'origin':
-                        linear_model.loc[idx, 'COP'] = (
-                            partload_char.loc[idx, 'Q'].max()
-                            / partload_char.loc[idx, 'P'].max()
-                            )
-                    elif line_type == 'offset':
-                        linear_model.loc[idx, 'c_1'] = (
-                            (partload_char.loc[idx, 'Q'].max()
-                             - partload_char.loc[idx, 'Q'].min())
-                            / (partload_char.loc[idx, 'P'].max()
-                               - partload_char.loc[idx, 'P'].min())
-                            )
-                        linear_model.loc[idx, 'c_0'] = (
-                            partload_char.loc[idx, 'Q'].max()
-                            - partload_char.loc[idx, 'P'].max()
-                            * linear_model.loc[idx, 'c_1']
-                            )
-                elif regression_type == 'OLS':
-                    regressor = partload_char.loc[idx, variable].to_numpy()
-                    regressor = regressor.reshape(-1, 1)
-                    response = partload_char.loc[idx, resp_variable].to_numpy()
-                    if line_type == 'origin':
-                        LinReg = LinearRegression(fit_intercept=False).fit(
-                            regressor, response
-                            )
-                        linear_model.loc[idx, 'COP'] = LinReg.coef_[0]
-                    elif line_type == 'offset':
-                        LinReg = LinearRegression().fit(regressor, response)
-                        linear_model.loc[idx, 'c_1'] = LinReg.coef_[0]
-                        linear_model.loc[idx, 'c_0'] = LinReg.intercept_
-
-        if normalize:
-            variable_nom = partload_char.loc[
-                (np.round(normalize['T_hs_ff'], 3),
-                 np.round(normalize['T_cons_ff'], 3)),
-                variable
-                ].max()
-
-            linear_model[f'{variable}_max'] /= variable_nom
-            linear_model[f'{variable}_min'] /= variable_nom
-            if line_type == 'offset':
-                linear_model['c_0'] /= variable_nom
-                linear_model['c_1'] /= variable_nom
-
-        return linear_model
-
-    def arrange_char_timeseries(self, linear_model, temp_ts):
-        """
-        Arrange a timeseries of the characteristics based on temperature data.
-
-        If T_cons_ff in temperature timeseries is out of bounds, the closest
-        characteristic (min. or max. temperature).
-
-        Parameters
-        ----------
-        linear_model : pd.DataFrame
-            DataFrame of the linearized partload characteristic with a
-            MultiIndex of the three variables 'T_hs_ff' and 'T_cons_ff'.
-
-        temp_ts : pd.DataFrame
-            Timeseries of 'T_hs_ff' and 'T_cons_ff' as they occur in the period
-            observed.
-        """
-        char_ts = pd.DataFrame(
-            index=temp_ts.index, columns=linear_model.columns
-            )
-        for i in temp_ts.index:
-            try:
-                char_ts.loc[i, :] = linear_model.loc[
-                    (temp_ts.loc[i, 'T_hs_ff'], temp_ts.loc[i, 'T_cons_ff']), :
-                    ]
-            except KeyError:
-                print(temp_ts.loc[i, 'T_cons_ff'], 'not in linear_model.')
-                T_cons_ff_range = linear_model.index.get_level_values('T_cons_ff')
-                if temp_ts.loc[i, 'T_cons_ff'] < min(T_cons_ff_range):
-                    multi_idx = (
-                        temp_ts.loc[i, 'T_hs_ff'], min(T_cons_ff_range)
-                        )
-                elif temp_ts.loc[i, 'T_cons_ff'] > max(T_cons_ff_range):
-                    multi_idx = (
-                        temp_ts.loc[i, 'T_hs_ff'], max(T_cons_ff_range)
-                        )
-                char_ts.loc[i, :] = linear_model.loc[multi_idx, :]
-
-        return char_ts
-
     def get_plotting_states(self, **kwargs):
         """Generate data of states to plot in state diagram."""
         data = {}
@@ -648,23 +392,6 @@ class HeatPumpSimple(HeatPumpBase):
              self.comps['comp'].get_plotting_data()[1]}
         )
 
-        for comp in data:
-            if 'Compressor' in comp:
-                data[comp]['starting_point_value'] *= 0.999999
+        data[self.comps['comp'].label]['starting_point_value'] *= 0.999999
 
         return data
-
-    def perform_exergy_analysis(self, print_results=False, **kwargs):
-        """Perform exergy analysis."""
-        self.ean = ExergyAnalysis(
-            self.nw,
-            E_F=[self.busses['power input'], self.busses['heat input']],
-            E_P=[self.busses['heat output']]
-            )
-        self.ean.analyse(
-            pamb=self.params['ambient']['p'], Tamb=self.params['ambient']['T']
-            )
-        if print_results:
-            self.ean.print_results(**kwargs)
-
-        self.epsilon = self.ean.network_data['epsilon']
@@ -6,8 +6,10 @@ Created on Mon Feb  1 11:43:39 2021
 @author: Jonas Freißmann
 """
 
+from bisect import bisect_right
+from functools import lru_cache
+
 import numpy as np
-import pandas as pd
 
 try:
     from scipy.optimize import curve_fit
@@ -17,19 +19,66 @@ except ImportError:
         + 'be imported'
         )
 
+# Defined intervals for power output in kW and chp bonus in ct/kWh (KWKG)
+CHP_P_INTERVALS = np.array([0.0, 50.0, 100.0, 250.0, 2000.0], dtype=np.float64)
+CHP_BONUS_INTERVALS = {
+    'grid': np.array([8.0, 6.0, 5.0, 4.4, 3.4], dtype=np.float64),
+    'self-sufficient': np.array([4.0, 3.0, 2.0, 1.5, 1.0], dtype=np.float64)
+    }
+# Weighted bonus of all complete intervals below each interval border
+CHP_BONUS_CUMULATED = {
+    use_case: np.concatenate(
+        [[0.0], np.cumsum(np.diff(CHP_P_INTERVALS) * bonus[:-1])]
+        )
+    for use_case, bonus in CHP_BONUS_INTERVALS.items()
+    }
+# Tables are shared by all calls, so protect them against modification
+for _table in (
+        CHP_P_INTERVALS, *CHP_BONUS_INTERVALS.values(),
+        *CHP_BONUS_CUMULATED.values()
+        ):
+    _table.setflags(write=False)
+del _table
+# Plain Python copies of the tables for the scalar code path
+_CHP_SCALAR_TABLES = {
+    use_case: (
+        CHP_P_INTERVALS.tolist(), bonus.tolist(),
+        CHP_BONUS_CUMULATED[use_case].tolist()
+        )
+    for use_case, bonus in CHP_BONUS_INTERVALS.items()
+    }
+
+# Coefficients a, b of specific solar thermal cost a * ln(A) + b in €/m²
+SOL_COST_COEFFS = {
+    'flat': (-34.06, 592.48),
+    'vacuum': (-40.63, 726.64)
+    }
+
+
 def calc_bwsf(i, n):
     """Berechne Barwert Summenfaktor.
     
     Parameters:
     -----------
-    i : float
+    i : float or array
         Kapitalzins als rationale Zahl (nicht Prozent)
 
-    n : int
+    n : int or array
         Lebensdauer des Investments in Jahren
     """
-    q = 1+i
-    return (q**n - 1)/(q**n * (q - 1))
+    # Arrays are not hashable, so only scalar arguments use the cache
+    if np.ndim(i) or np.ndim(n):
+        return _bwsf(np.asarray(i, dtype=float), np.asarray(n))
+    return _bwsf_cached(i, n)
+
+
+def _bwsf(i, n):
+    """Barwert Summenfaktor für Skalare oder Arrays."""
+    qn = (1 + i)**n
+    return (qn - 1)/(qn * i)
+
+
+_bwsf_cached = lru_cache(maxsize=128)(_bwsf)
 
 
 def npv(invest, cashflow, i=0.05, n=20):
@@ -42,8 +91,7 @@ def npv(invest, cashflow, i=0.05, n=20):
     n:          Betrachtungsdauer
     bwsf:       Barwert Summenfaktor
     """
-    q = 1+i
-    bwsf = (q**n - 1)/(q**n * (q - 1))
+    bwsf = calc_bwsf(i, n)
 
     npv = -invest + bwsf * cashflow
     return npv
@@ -61,8 +109,7 @@ def LCOH(invest, cost, Q, revenue=0, i=0.05, n=20):
     i:          Kalkulationszinssatz
     n:          Betrachtungsdauer
     """
-    q = 1 + i
-    bwsf = (q**n - 1)/(q**n * (q - 1))
+    bwsf = calc_bwsf(i, n)
 
     LCOH = (invest + bwsf * (cost - revenue))/(bwsf * Q)
     return LCOH
@@ -84,40 +131,40 @@ def emission_calc(data_all, data, param):
     param : dict
         JSON parameter file of user defined constants.
     """
-    data_all['Emissions OM'] = 0
-    data_all['Emissions DM'] = 0
-
-    if 'P_sub_source' in data_all.columns:
-        data_all['Sub Emissions OM'] = 0
-        data_all['Sub Emissions DM'] = 0
-
-    if 'H_source' in data_all.columns:
-        data_all['Emissions OM'] += (
-            data_all['H_source'] * param['param']['ef_gas']
-            )
-        data_all['Emissions DM'] += (
-            data_all['H_source'] * param['param']['ef_gas']
+    # Fuel emissions are identical for both mixes and the grid exchange only
+    # enters via the net purchase, so each term is evaluated once
+    cols = set(data_all.columns)
+    n_steps = len(data_all.index)
+    # Emission factors of both mixes as columns of one (n_steps, 2) array,
+    # only read if electricity flows exist
+    if cols & {'P_source', 'P_spotmarket', 'P_sub_source'}:
+        ef = data[['ef_om', 'ef_dm']].reindex(data_all.index).to_numpy()
+
+    em_fuel = np.zeros(n_steps)
+    if 'H_source' in cols:
+        em_fuel += data_all['H_source'].to_numpy() * param['param']['ef_gas']
+    if 'H_bio_source' in cols:
+        em_fuel += (
+            data_all['H_bio_source'].to_numpy() * param['param']['ef_biogas']
             )
 
-    if 'H_bio_source' in data_all.columns:
-        data_all['Emissions OM'] += (
-            data_all['H_bio_source'] * param['param']['ef_biogas']
-            )
-        data_all['Emissions DM'] += (
-            data_all['H_bio_source'] * param['param']['ef_biogas']
-            )
+    em = np.repeat(em_fuel[:, np.newaxis], 2, axis=1)
+    if 'P_source' in cols or 'P_spotmarket' in cols:
+        P_net = np.zeros(n_steps)
+        if 'P_source' in cols:
+            P_net += data_all['P_source'].to_numpy()
+        if 'P_spotmarket' in cols:
+            P_net -= data_all['P_spotmarket'].to_numpy()
 
-    if 'P_source' in data_all.columns:
-        data_all['Emissions OM'] += data_all['P_source'] * data['ef_om']
-        data_all['Emissions DM'] += data_all['P_source'] * data['ef_dm']
-    if 'P_sub_source' in data_all.columns:
-        data_all['Sub Emissions OM'] += data_all['P_sub_source'] * data['ef_om']
-        data_all['Sub Emissions DM'] += data_all['P_sub_source'] * data['ef_dm']
+        em += P_net[:, np.newaxis] * ef
 
+    data_all['Emissions OM'] = em[:, 0]
+    data_all['Emissions DM'] = em[:, 1]
 
-    if 'P_spotmarket' in data_all.columns:
-        data_all['Emissions OM'] -= data_all['P_spotmarket'] * data['ef_om']
-        data_all['Emissions DM'] -= data_all['P_spotmarket'] * data['ef_dm']
+    if 'P_sub_source' in cols:
+        em_sub = data_all['P_sub_source'].to_numpy()[:, np.newaxis] * ef
+        data_all['Sub Emissions OM'] = em_sub[:, 0]
+        data_all['Sub Emissions DM'] = em_sub[:, 1]
 
     return data_all
 
@@ -125,24 +172,40 @@ def emission_calc(data_all, data, param):
 def invest_sol(A, col_type=''):
     """Pehnt et al. 2017, Markus [38].
 
-    A:                Kollektorfläche der Solarthermie
+    A:                Kollektorfläche der Solarthermie (float oder array)
     col_type:         Kollektortyp der Solarthermie
     specific_coasts:  Spezifische Kosten
     invest:           Investitionskosten
     """
-    if col_type == 'flat':
-        specific_costs = -34.06 * np.log(A) + 592.48
-        invest = A * specific_costs
-        return invest
-    elif col_type == 'vacuum':
-        specific_costs = -40.63 * np.log(A) + 726.64
-        invest = A * specific_costs
-        return invest
-    else:
+    if col_type not in SOL_COST_COEFFS:
         raise ValueError(
             "Choose a valid collector type: 'flat' or 'vacuum'"
             )
 
+    a, b = SOL_COST_COEFFS[col_type]
+    specific_costs = a * np.log(A) + b
+    invest = A * specific_costs
+    return invest
+
+
+@lru_cache(maxsize=None)
+def fit_stes_cost_degression():
+    """Fit potential function of specific STES cost to reference values.
+
+    The reference values are constant, so the fit only has to be performed
+    once. Returns the parameters a and b of the function a * x^b.
+    """
+    # Kostendegression STES
+    def potential_func(x, a, b):
+        return a * x ** b
+
+    x = [500, 5000, 62000]
+    y = [320, 110, 2359594/62000]
+
+    params, params_covariance = curve_fit(potential_func, x, y)
+
+    return tuple(params)
+
 
 def invest_stes(Q):
     """Investment calculation for seasonal thermal energy storages.
@@ -152,17 +215,10 @@ def invest_stes(Q):
                     Wirtschaft und Ausfuhrkontrolle [10])
     q_V:            spez. volumetrische Energie
     """
-    # Kostendegression STES
-    def potential_func(x, a, b):
-        return a * x ** b
-
     if Q == 0:
         return 0
 
-    x = [500, 5000, 62000]
-    y = [320, 110, 2359594/62000]
-
-    params, params_covariance = curve_fit(potential_func, x, y)
+    params = fit_stes_cost_degression()
 
     q_V = 0.07
     V_stes = Q / q_V
@@ -183,46 +239,63 @@ def invest_stes(Q):
 def chp_bonus(P, use_case):
     """Calculate chp bonus based on nominal power output in.
 
-    P:           nomimal power output of chp unit in kW (int or float)
+    P:           nomimal power output of chp unit in kW (float or array)
     use_case:    either 'grid' or 'self-sufficient' (str)
-    bonus:       calculated chp bonus in ct/kWh (float)
+    bonus:       calculated chp bonus in ct/kWh (float or array like P)
     """
-    if P == 0:
-        return 0
-    if use_case == 'grid':
-        bonus_intervals = [8.0, 6.0, 5.0, 4.4, 3.4]
-    elif use_case == 'self-sufficient':
-        bonus_intervals = [4.0, 3.0, 2.0, 1.5, 1.0]
-    else:
-        print('No valid use case given.')
-
-    # Defined intervals for power output (KWKG)
-    P_intervals = [0.0, 50.0, 100.0, 250.0, 2000.0]
-
-    # Calculate steps between power output intervals
-    P_steps = list()
-    for i in range(1, len(P_intervals)):
-        P_steps += [P_intervals[i] - P_intervals[i-1]]
-
-    # Check at which index the last power value is bigger than P
-    idx = len(P_intervals) - 1
-    for i in range(len(P_intervals)):
-        if P < P_intervals[i]:
-            idx = i - 1
-            break
-
-    # Add the weighted bonus values for all complete intervals
-    bonus_weighted = 0
-    for i in range(idx):
-        bonus_weighted += P_steps[i] * bonus_intervals[i]
-
-    # Add the weighted bonus for the last incomplete interval
-    bonus_weighted += (P - P_intervals[idx]) * bonus_intervals[idx]
+    if use_case not in CHP_BONUS_INTERVALS:
+        raise ValueError(
+            "Choose a valid use case: 'grid' or 'self-sufficient'"
+            )
+
+    if np.ndim(P) == 0:
+        return _chp_bonus_scalar(float(P), use_case)
+
+    P = np.asarray(P, dtype=float)
+
+    # Find the interval P lies in, i.e. the last interval border below P
+    idx = np.searchsorted(CHP_P_INTERVALS, P, side='right') - 1
+
+    # Weighted bonus of all complete intervals plus the incomplete last one
+    bonus_weighted = (
+        CHP_BONUS_CUMULATED[use_case][idx]
+        + (P - CHP_P_INTERVALS[idx]) * CHP_BONUS_INTERVALS[use_case][idx]
+        )
 
     # Calculate the nominal bonus by deviding by the sum of weights (P)
-    bonus = bonus_weighted / P
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(P == 0, 0.0, bonus_weighted / P)
+
 
-    return bonus
+def _chp_bonus_scalar(P, use_case):
+    """Calculate chp bonus for a single float without array overhead."""
+    if P == 0:
+        return 0.0
+
+    P_intervals, bonus_intervals, bonus_cumulated = _CHP_SCALAR_TABLES[use_case]
+    idx = bisect_right(P_intervals, P) - 1
+
+    bonus_weighted = (
+        bonus_cumulated[idx] + (P - P_intervals[idx]) * bonus_intervals[idx]
+        )
+
+    return bonus_weighted / P
+
+
+def _bew_bonus_conventional(SCOP):
+    """Uncapped BEW bonus in ct/kWh for grid electricity."""
+    return (5.5 - (6.8 - 17/SCOP) * 0.75) * SCOP/(SCOP - 1)
+
+
+def _bew_bonus_renewable(SCOP):
+    """Uncapped BEW bonus in ct/kWh for directly used renewable electricity."""
+    return 3 - (8/2.5 - 8/SCOP) * 0.75
+
+
+BEW_BONUS_FUNCS = {
+    'conventional': _bew_bonus_conventional,
+    'renewable': _bew_bonus_renewable
+    }
 
 
 def bew_op_bonus(SCOP, el_source_type='conventional'):
@@ -239,7 +312,7 @@ def bew_op_bonus(SCOP, el_source_type='conventional'):
     Parameters
     ----------
 
-    SCOP : float
+    SCOP : float or array
         Seasonal Coefficient of Performance of the heat pump.
 
     el_source_type : str
@@ -247,12 +320,28 @@ def bew_op_bonus(SCOP, el_source_type='conventional'):
         'renewable' for direct use of renewable electricity sources.
         Defaults to 'conventional'
     """
+    if el_source_type not in BEW_BONUS_FUNCS:
+        raise ValueError(
+            "Choose a valid electricity source type: 'conventional' or "
+            + "'renewable'"
+            )
+    bonus_func = BEW_BONUS_FUNCS[el_source_type]
+
+    if np.ndim(SCOP) == 0:
+        return _bew_op_bonus_scalar(float(SCOP), bonus_func)
+
+    SCOP = np.asarray(SCOP, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bonus = bonus_func(SCOP)
+
+    return np.where(SCOP < 2.5, 0.0, np.minimum(bonus*10, 92.00))
+
+
+def _bew_op_bonus_scalar(SCOP, bonus_func):
+    """Calculate operating cost BEW bonus for a single float SCOP."""
     if SCOP < 2.5:
-        return 0
-    else:
-        if el_source_type == 'conventional':
-            bonus = (5.5 - (6.8 - 17/SCOP) * 0.75) * SCOP/(SCOP - 1)
-        elif el_source_type == 'renewable':
-            bonus = 3 - (8/2.5 - 8/SCOP) * 0.75
+        return 0.0
 
-        return min(bonus*10, 92.00)
+    bonus = bonus_func(SCOP) * 10
+    return 92.00 if bonus > 92.00 else bonus
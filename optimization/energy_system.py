@@ -1,12 +1,93 @@
 # -*- coding: utf-8 -*-
 
+import numpy as np
 import oemof.solph as solph
-import pandas as pd
-from eco_funcs import bew_op_bonus, chp_bonus
-from helpers import calc_bew_el_cost_prim, calc_bew_el_cost_sub
+from eco_funcs import chp_bonus
+from helpers import (
+    calc_elec_source_cost, fix_profile, solve_model, time_index,
+    to_sequence
+    )
 
+# NonConvex only holds the default status options and no flow specific state,
+# so all nonconvex flows share one instance
+NONCONVEX = solph.NonConvex()
 
-def primary_network(data, param, use_hp=True, return_unsolved=False):
+
+def chp_bonus_converters(unit, unit_node, enw, spotmarket_node, P_N, P_max,
+                         bonus, param):
+    """
+    Build the converters splitting the electricity of a chp unit.
+
+    Parameters
+    ----------
+
+    unit : str
+        Label of the chp unit, e.g. 'ccet' or 'ice'.
+
+    unit_node : oemof.solph.Bus
+        Bus of the electricity generated by the chp unit.
+
+    enw : oemof.solph.Bus
+        Electricity network for the internal use.
+
+    spotmarket_node : oemof.solph.Bus
+        Bus of the electricity sold on the spot market.
+
+    P_N : float
+        Electrical capacity eligible for the chp bonus.
+
+    P_max : float
+        Maximal electrical output of the chp unit.
+
+    bonus : float
+        Specific chp bonus.
+
+    param : dict
+        JSON parameter file of user defined constants.
+    """
+    with_chp_bonus = solph.components.Converter(
+        label=f'{unit} with chp bonus',
+        inputs={unit_node: solph.Flow()},
+        outputs={
+            spotmarket_node: solph.Flow(
+                nominal_value=P_N,
+                max=1.0,
+                min=0.0,
+                full_load_time_max=param['param']['h_max_chp_bonus'],
+                variable_costs=(
+                    -bonus - param['param']['TEHG_bonus'])
+                )},
+        conversion_factors={spotmarket_node: 1}
+        )
+
+    # Electricity without chp bonus is split directly from the unit node
+    no_chp_bonus_int = solph.components.Converter(
+        label=f'{unit} no chp bonus internally',
+        inputs={unit_node: solph.Flow()},
+        outputs={enw: solph.Flow(
+            nominal_value=P_max,
+            max=1.0,
+            min=0.0
+            )},
+        conversion_factors={enw: 1}
+        )
+
+    no_chp_bonus_ext = solph.components.Converter(
+        label=f'{unit} no chp bonus externally',
+        inputs={unit_node: solph.Flow()},
+        outputs={spotmarket_node: solph.Flow(
+            nominal_value=P_max,
+            max=1.0,
+            min=0.0
+            )},
+        conversion_factors={spotmarket_node: 1}
+        )
+
+    return [with_chp_bonus, no_chp_bonus_int, no_chp_bonus_ext]
+
+
+def primary_network(data, param, use_hp=True, return_unsolved=False,
+                    bew_el_cost=None):
     """
     Generate and solve mixed integer linear problem of the primary network.
 
@@ -26,10 +107,13 @@ def primary_network(data, param, use_hp=True, return_unsolved=False):
     return_unsolved : bool
         Flag to set 'True' if the energy system should be returned unsolved.
         (Default: 'False')
+
+    bew_el_cost : tuple
+        Already calculated result of `calc_bew_el_cost_prim` to avoid its
+        recalculation. (Default: 'None')
     """
     # %% Create time index
-    periods = len(data)
-    date_time_index = pd.date_range(data.index[0], periods=periods, freq='h')
+    date_time_index = time_index(data)
 
     # %% Create energy system
     energy_system = solph.EnergySystem(
@@ -37,17 +121,23 @@ def primary_network(data, param, use_hp=True, return_unsolved=False):
         )
 
     # %% Busses
+    # All nodes are collected and added to the energy system at once
+    nodes = []
+
     gnw = solph.Bus(label='gas network')
     enw = solph.Bus(label='electricity network')
     hnw = solph.Bus(label='heat network')
 
     ccet_node = solph.Bus(label='ccet node')
-    ccet_no_bonus_node = solph.Bus(label='ccet no bonus node')
     spotmarket_node = solph.Bus(label='spotmarket node')
 
-    energy_system.add(
-        gnw, enw, hnw, ccet_node, ccet_no_bonus_node, spotmarket_node
-        )
+    nodes.extend([gnw, enw, hnw, ccet_node, spotmarket_node])
+
+    # %% Time series
+    # solph reads flow attributes per time step, which is a plain index
+    # access on arrays instead of a label lookup on the DatetimeIndex
+    el_spot_price = data['el_spot_price'].to_numpy()
+    heat_demand = data['heat_demand'].to_numpy()
 
     # %% Sources
     gas_source = solph.components.Source(
@@ -55,39 +145,18 @@ def primary_network(data, param, use_hp=True, return_unsolved=False):
         outputs={
             gnw: solph.Flow(
                 variable_costs=(
-                    data['gas_price']
-                    + (data['co2_price'] * param['param']['ef_gas'])
+                    data['gas_price'].to_numpy()
+                    + (data['co2_price'].to_numpy() * param['param']['ef_gas'])
                     ))}
         )
 
     try:
-        if param['param']['use_BEW_op_bonus']:
-            bew_op_bonus_Q_in_grid, bew_op_bonus_Q_in_self = calc_bew_el_cost_prim(
-                data, param
-                )
-            hp_P_max = (data['hp_Q_max'] - data['hp_c_0']) / data['hp_c_1']
-
-            elec_source_cost = (
-                param['param']['elec_consumer_charges_grid']
-                - param['param']['elec_consumer_charges_self']
-                + data['el_spot_price']
-                + (data['hp_Q_max'] / hp_P_max) * (
-                    - bew_op_bonus_Q_in_grid
-                    + bew_op_bonus_Q_in_self
-                    )
-                )
-        else:
-            bew_op_bonus_Q_in_self = 0
-            elec_source_cost = (
-                param['param']['elec_consumer_charges_grid']
-                - param['param']['elec_consumer_charges_self']
-                + data['el_spot_price']
-                )
+        elec_source_cost, bew_op_bonus_Q_in_self = calc_elec_source_cost(
+            data, param, bew_el_cost=bew_el_cost
+            )
     except KeyError:
-        elec_source_cost = (
-            param['param']['elec_consumer_charges_grid']
-            - param['param']['elec_consumer_charges_self']
-            + data['el_spot_price']
+        elec_source_cost, bew_op_bonus_Q_in_self = calc_elec_source_cost(
+            data, param, use_bew_op_bonus=False
             )
 
     elec_source = solph.components.Source(
@@ -99,7 +168,7 @@ def primary_network(data, param, use_hp=True, return_unsolved=False):
             }
         )
 
-    energy_system.add(gas_source, elec_source)
+    nodes.extend([gas_source, elec_source])
 
     # %% Sinks
     elec_sink = solph.components.Sink(
@@ -107,24 +176,30 @@ def primary_network(data, param, use_hp=True, return_unsolved=False):
         inputs={
             spotmarket_node: solph.Flow(
                 variable_costs=(
-                    -data['el_spot_price'] - param['param']['vNNE']
+                    -el_spot_price - param['param']['vNNE']
                     ))}
         )
 
+    heat_demand_max, heat_demand_rel = fix_profile(heat_demand)
     heat_sink = solph.components.Sink(
         label='heat demand',
         inputs={
             hnw: solph.Flow(
                 variable_costs=-param['param']['heat_price'],
-                nominal_value=data['heat_demand'].max(),
-                fix=data['heat_demand']/data['heat_demand'].max()
+                nominal_value=heat_demand_max,
+                fix=heat_demand_rel
                 )}
         )
 
-    energy_system.add(elec_sink, heat_sink)
+    nodes.extend([elec_sink, heat_sink])
 
     # %% Heat pump
     if use_hp:
+        hp_Q_max = data['hp_Q_max'].to_numpy()
+        hp_Q_min = data['hp_Q_min'].to_numpy()
+        hp_c_0 = data['hp_c_0'].to_numpy()
+        hp_c_1 = data['hp_c_1'].to_numpy()
+        hp_var_cost = param['hp']['op_cost_var'] - bew_op_bonus_Q_in_self
         for i, Q_N_hp in enumerate(param['hp']['Q_Ns'].values()):
             # Heat pump component
             hp = solph.components.OffsetConverter(
@@ -137,19 +212,16 @@ def primary_network(data, param, use_hp=True, return_unsolved=False):
                 outputs={
                     hnw: solph.Flow(
                         nominal_value=1,
-                        max=Q_N_hp*data['hp_Q_max'],
-                        min=Q_N_hp*data['hp_Q_min'],
-                        variable_costs=(
-                            param['hp']['op_cost_var']
-                            - bew_op_bonus_Q_in_self
-                            ),
-                        nonconvex=solph.NonConvex()
+                        max=Q_N_hp*hp_Q_max,
+                        min=Q_N_hp*hp_Q_min,
+                        variable_costs=hp_var_cost,
+                        nonconvex=NONCONVEX
                         )
                     },
-                coefficients=[Q_N_hp*data['hp_c_0'], data['hp_c_1']]
+                coefficients=[Q_N_hp*hp_c_0, hp_c_1]
                 )
 
-            energy_system.add(hp)
+            nodes.append(hp)
 
     # %% Combined cycle extraction turbine
     # ccet = solph.components.GenericCHP(
@@ -157,7 +229,7 @@ def primary_network(data, param, use_hp=True, return_unsolved=False):
     #     fuel_input={
     #         gnw: solph.Flow(
     #             custom_attributes={
-    #                 'H_L_FG_share_max': data['ccet_H_L_FG_share_max'].tolist()
+    #                 'H_L_FG_share_max': data['ccet_H_L_FG_share_max'].to_numpy()
     #                 },
     #             nominal_value=data['ccet_Q_in'].mean()
     #             )},
@@ -165,22 +237,26 @@ def primary_network(data, param, use_hp=True, return_unsolved=False):
     #         ccet_node: solph.Flow(
     #             variable_costs=param['ccet']['op_cost_var'],
     #             custom_attributes={
-    #                 'P_max_woDH': data['ccet_P_max_woDH'].tolist(),
-    #                 'P_min_woDH': data['ccet_P_min_woDH'].tolist(),
-    #                 'Eta_el_max_woDH': data['ccet_eta_el_max'].tolist(),
-    #                 'Eta_el_min_woDH': data['ccet_eta_el_min'].tolist()
+    #                 'P_max_woDH': data['ccet_P_max_woDH'].to_numpy(),
+    #                 'P_min_woDH': data['ccet_P_min_woDH'].to_numpy(),
+    #                 'Eta_el_max_woDH': data['ccet_eta_el_max'].to_numpy(),
+    #                 'Eta_el_min_woDH': data['ccet_eta_el_min'].to_numpy()
     #                 }
     #             )},
     #     heat_output={
     #         hnw: solph.Flow(
-    #             custom_attributes={'Q_CW_min': data['ccet_Q_CW_min'].tolist()}
+    #             custom_attributes={'Q_CW_min': data['ccet_Q_CW_min'].to_numpy()}
     #             )},
-    #     beta=data['ccet_beta'].tolist(),
+    #     beta=data['ccet_beta'].to_numpy(),
     #     back_pressure=False
     #     )
 
     # energy_system.add(ccet)
 
+    ccet_eta_el = to_sequence(data['ccet_eta_el'])
+    ccet_eta_th = to_sequence(data['ccet_eta_th'])
+    # Status variables are only needed to enforce a minimal load
+    ccet_Q_min = data['ccet_H_min'].to_numpy()*ccet_eta_th
     ccet = solph.components.Converter(
         label='ccet',
         inputs={gnw: solph.flows.Flow()},
@@ -190,18 +266,18 @@ def primary_network(data, param, use_hp=True, return_unsolved=False):
                 ),
             hnw: solph.flows.Flow(
                 nominal_value=param['ccet']['Q_N'],
-                max=(data['ccet_H_max']*data['ccet_eta_th']),
-                min=(data['ccet_H_min']*data['ccet_eta_th']),
-                nonconvex=solph.NonConvex()
+                max=data['ccet_H_max'].to_numpy()*ccet_eta_th,
+                min=ccet_Q_min,
+                nonconvex=NONCONVEX if ccet_Q_min.any() else None
                 )
             },
         conversion_factors={
-            ccet_node: data['ccet_eta_el'],
-            hnw: data['ccet_eta_th']
+            ccet_node: ccet_eta_el,
+            hnw: ccet_eta_th
             }
         )
 
-    energy_system.add(ccet)
+    nodes.append(ccet)
 
     # %% Peak load boiler
     plb = solph.components.Converter(
@@ -219,9 +295,13 @@ def primary_network(data, param, use_hp=True, return_unsolved=False):
         conversion_factors={hnw: param['plb']['eta']}
         )
 
-    energy_system.add(plb)
+    nodes.append(plb)
 
     # %% Short term storage
+    # Status variables are only needed to enforce a minimal (dis)charging
+    # load, without one they just add binaries to the MIP
+    st_tes_in_min = param['st-tes'].get('Q_rel_in_min', 0)
+    st_tes_out_min = param['st-tes'].get('Q_rel_out_min', 0)
     st_tes = solph.components.GenericStorage(
         label='st-tes',
         nominal_storage_capacity=param['st-tes']['Q'],
@@ -229,74 +309,38 @@ def primary_network(data, param, use_hp=True, return_unsolved=False):
             hnw: solph.Flow(
                 nominal_value=param['st-tes']['Q_in'],
                 variable_costs=param['st-tes']['op_cost_var'],
-                nonconvex=solph.NonConvex()
+                min=st_tes_in_min,
+                nonconvex=NONCONVEX if st_tes_in_min > 0 else None
                 )},
         outputs={
             hnw: solph.Flow(
                 nominal_value=param['st-tes']['Q_out'],
-                nonconvex=solph.NonConvex())},
+                min=st_tes_out_min,
+                nonconvex=NONCONVEX if st_tes_out_min > 0 else None
+                )},
         initial_storage_level=param['st-tes']['init_storage'],
         loss_rate=param['st-tes']['Q_rel_loss'],
         inflow_conversion_factor=param['st-tes']['inflow_conv'],
         outflow_conversion_factor=param['st-tes']['outflow_conv'])
 
-    energy_system.add(st_tes)
+    nodes.append(st_tes)
 
     # %% Auxillary components
     ccet_P_N = data['ccet_P_max_woDH'].mean()
     ccet_chp_bonus = chp_bonus(ccet_P_N * 1e3, use_case='grid') * 10
-    ccet_with_chp_bonus = solph.components.Converter(
-        label='ccet with chp bonus',
-        inputs={ccet_node: solph.Flow()},
-        outputs={
-            spotmarket_node: solph.Flow(
-                nominal_value=ccet_P_N,
-                max=1.0,
-                min=0.0,
-                full_load_time_max=param['param']['h_max_chp_bonus'],
-                variable_costs=(
-                    -ccet_chp_bonus - param['param']['TEHG_bonus'])
-                )},
-        conversion_factors={enw: 1}
-        )
 
-    ccet_no_chp_bonus = solph.components.Converter(
-        label='ccet no chp bonus',
-        inputs={ccet_node: solph.Flow()},
-        outputs={ccet_no_bonus_node: solph.Flow(
-            nominal_value=9999,
-            max=1.0,
-            min=0.0
-            )},
-        conversion_factors={ccet_no_bonus_node: 1}
+    # Maximal electricity output of the ccet instead of an arbitrary large
+    # value, it never restricts the split but tightens the LP relaxation
+    ccet_P_max = param['ccet']['Q_N'] * np.max(
+        data['ccet_H_max'].to_numpy() * ccet_eta_el
         )
 
-    ccet_no_chp_bonus_int = solph.components.Converter(
-        label='ccet no chp bonus internally',
-        inputs={ccet_no_bonus_node: solph.Flow()},
-        outputs={enw: solph.Flow(
-            nominal_value=9999,
-            max=1.0,
-            min=0.0
-            )},
-        conversion_factors={enw: 1}
-        )
+    nodes.extend(chp_bonus_converters(
+        'ccet', ccet_node, enw, spotmarket_node, ccet_P_N, ccet_P_max,
+        ccet_chp_bonus, param
+        ))
 
-    ccet_no_chp_bonus_ext = solph.components.Converter(
-        label='ccet no chp bonus externally',
-        inputs={ccet_no_bonus_node: solph.Flow()},
-        outputs={spotmarket_node: solph.Flow(
-            nominal_value=9999,
-            max=1.0,
-            min=0.0
-            )},
-        conversion_factors={spotmarket_node: 1}
-        )
-
-    energy_system.add(
-        ccet_with_chp_bonus, ccet_no_chp_bonus,
-        ccet_no_chp_bonus_int, ccet_no_chp_bonus_ext
-        )
+    energy_system.add(*nodes)
 
     # %% Return unsolved
     if return_unsolved:
@@ -305,10 +349,8 @@ def primary_network(data, param, use_hp=True, return_unsolved=False):
     # %% Solve
     model = solph.Model(energy_system)
     # model.write('my_model.lp', io_options={'symbolic_solver_labels': True})
-    model.solve(
-        solver='gurobi', solve_kwargs={'tee': True},
-        cmdline_options={"mipgap": param['param']['mipgap']}
-        )
+    # The dispatch model prints the solver log unless 'verbose' is False
+    solve_model(model, param, verbose=True)
 
     # Ergebnisse in results
     results = solph.processing.results(model)
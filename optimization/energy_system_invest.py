@@ -1,10 +1,136 @@
 # -*- coding: utf-8 -*-
 
+import numpy as np
 import oemof.solph as solph
 import pandas as pd
-from eco_funcs import bew_op_bonus, calc_bwsf, chp_bonus
-from energy_system import primary_network
-from helpers import calc_bew_el_cost_prim, calc_bew_el_cost_sub
+from eco_funcs import calc_bwsf
+from energy_system import NONCONVEX, chp_bonus_converters, primary_network
+from helpers import (
+    calc_bew_el_cost_prim, calc_bew_el_cost_sub, calc_elec_source_cost,
+    fix_profile, solve_model, time_index, to_sequence
+    )
+
+
+def _results(model, param):
+    """
+    Extract the results of all flows or only of the requested ones.
+
+    param['param']['result_flows'] optionally lists pairs of node labels.
+    Only the flow and, for investment flows, the invested capacity of these
+    flows are extracted, with the same layout as solph.processing.results.
+    An empty list skips the flow results, e.g. if a sweep only evaluates
+    the meta results.
+    """
+    result_flows = param['param'].get('result_flows')
+    if result_flows is None:
+        return solph.processing.results(model)
+
+    # Investment flows with a status variable have their own block
+    invest_blocks = [
+        getattr(model, name)
+        for name in ('InvestmentFlowBlock', 'InvestNonConvexFlowBlock')
+        if hasattr(model, name)
+        ]
+    results = {}
+    for label_from, label_to in result_flows:
+        node_from = model.es.groups[label_from]
+        node_to = model.es.groups[label_to]
+        flow = [
+            model.flow[node_from, node_to, p, t].value
+            for p, t in model.TIMEINDEX
+            ]
+        sequences = pd.DataFrame(
+            {'flow': flow}, index=model.es.timeindex[:len(flow)]
+            ).reindex(model.es.timeindex)
+        sequences.columns.name = 'variable_name'
+
+        scalars = pd.Series(dtype=float)
+        index = (node_from, node_to, model.PERIODS.first())
+        for block in invest_blocks:
+            if index in block.invest:
+                scalars = pd.Series({'invest': block.invest[index].value})
+
+        results[(node_from, node_to)] = {
+            'sequences': sequences, 'scalars': scalars
+            }
+
+    return results
+
+
+def _make_hps(key, enw, hnw, data, param, bwsf, bew_op_bonus_Q_in,
+              el_variable_costs=0):
+    """
+    Build all investment optimized heat pumps of one heat network.
+
+    Parameters
+    ----------
+
+    key : str
+        Key of the heat pump parameters in param, either 'hp' or 'sub hp'.
+        Names of the time series and labels of the heat pumps are derived
+        from it.
+
+    enw : oemof.solph.Bus
+        Electricity network supplying the heat pumps.
+
+    hnw : oemof.solph.Bus
+        Heat network supplied by the heat pumps.
+
+    data : pandas.DataFrame
+        Input time series parameters.
+
+    param : dict
+        Constant input parameters.
+
+    bwsf : float
+        Barwert Summenfaktor of the investment.
+
+    bew_op_bonus_Q_in : numpy.ndarray or float
+        BEW operating bonus per heat output.
+
+    el_variable_costs : float
+        Variable cost of the electricity input. (Default: 0)
+    """
+    # Characteristics and costs are identical for all heat pumps
+    prefix = key.replace(' ', '_')
+    hp_Q_max = data[f'{prefix}_Q_max'].to_numpy()
+    hp_Q_min = data[f'{prefix}_Q_min'].to_numpy()
+    hp_c_0 = data[f'{prefix}_c_0'].to_numpy()
+    hp_c_1 = data[f'{prefix}_c_1'].to_numpy()
+    hp_var_cost = param[key]['op_cost_var'] - bew_op_bonus_Q_in
+    bew_share = 1 - param['param']['BEW']
+    ep_costs = param[key]['inv_spez_m'] / bwsf * bew_share
+    offset = param[key]['inv_spez_b'] / bwsf * bew_share
+    cap_max = param[key]['cap_max']
+    cap_min = param[key]['cap_min']
+
+    hps = []
+    for i in range(1, param[key]['amount']+1):
+        hp = solph.components.OffsetConverter(
+            label=f"{key.replace('hp', 'heat pump')} {i}",
+            inputs={
+                enw: solph.flows.Flow(variable_costs=el_variable_costs)
+                },
+            outputs={
+                hnw: solph.flows.Flow(
+                    variable_costs=hp_var_cost,
+                    investment=solph.Investment(
+                        ep_costs=ep_costs,
+                        maximum=cap_max,
+                        minimum=cap_min,
+                        offset=offset,
+                        nonconvex=solph.NonConvex()
+                        ),
+                    max=hp_Q_max,
+                    min=hp_Q_min,
+                    nonconvex=NONCONVEX
+                    )
+                },
+            coefficients=[hp_c_0, hp_c_1]
+            )
+        hps.append(hp)
+
+    return hps
 
 
 def primary_network_invest(data, param, use_hp=True, return_unsolved=False):
@@ -34,8 +160,7 @@ def primary_network_invest(data, param, use_hp=True, return_unsolved=False):
         )
 
     # %% Create time index
-    periods = len(data)
-    date_time_index = pd.date_range(data.index[0], periods=periods, freq='h')
+    date_time_index = time_index(data)
 
     # %% Create energy system
     energy_system = solph.EnergySystem(
@@ -48,11 +173,10 @@ def primary_network_invest(data, param, use_hp=True, return_unsolved=False):
     hnw = solph.Bus(label='heat network')
 
     ccet_node = solph.Bus(label='ccet node')
-    ccet_no_bonus_node = solph.Bus(label='ccet no bonus node')
     spotmarket_node = solph.Bus(label='spotmarket node')
 
     energy_system.add(
-        gnw, enw, hnw, ccet_node, ccet_no_bonus_node, spotmarket_node
+        gnw, enw, hnw, ccet_node, spotmarket_node
         )
 
     # %% Sources
@@ -61,41 +185,20 @@ def primary_network_invest(data, param, use_hp=True, return_unsolved=False):
         outputs={
             gnw: solph.flows.Flow(
                 variable_costs=(
-                    data['gas_price']
-                    + (data['co2_price'] * param['param']['ef_gas'])
+                    data['gas_price'].to_numpy()
+                    + (data['co2_price'].to_numpy() * param['param']['ef_gas'])
                     ))}
         )
 
     # BEW operational bonus
     try:
-        if param['param']['use_BEW_op_bonus']:
-            bew_op_bonus_Q_in_grid, bew_op_bonus_Q_in_self = calc_bew_el_cost_prim(
-                data, param
-                )
-            hp_P_max = (data['hp_Q_max'] - data['hp_c_0']) / data['hp_c_1']
-
-            elec_source_cost = (
-                param['param']['elec_consumer_charges_grid']
-                - param['param']['elec_consumer_charges_self']
-                + data['el_spot_price']
-                + (data['hp_Q_max'] / hp_P_max) * (
-                    - bew_op_bonus_Q_in_grid
-                    + bew_op_bonus_Q_in_self
-                    )
-                )
-        else:
-            bew_op_bonus_Q_in_self = 0
-            elec_source_cost = (
-                param['param']['elec_consumer_charges_grid']
-                - param['param']['elec_consumer_charges_self']
-                + data['el_spot_price']
-                )
+        elec_source_cost, bew_op_bonus_Q_in_self = calc_elec_source_cost(
+            data, param
+            )
     except KeyError as e:
         print(f'KeyError Exception: {e}')
-        elec_source_cost = (
-            param['param']['elec_consumer_charges_grid']
-            - param['param']['elec_consumer_charges_self']
-            + data['el_spot_price']
+        elec_source_cost, bew_op_bonus_Q_in_self = calc_elec_source_cost(
+            data, param, use_bew_op_bonus=False
             )
 
     elec_source = solph.components.Source(
@@ -115,17 +218,18 @@ def primary_network_invest(data, param, use_hp=True, return_unsolved=False):
         inputs={
             spotmarket_node: solph.flows.Flow(
                 variable_costs=(
-                    -data['el_spot_price'] - param['param']['vNNE']
+                    -data['el_spot_price'].to_numpy() - param['param']['vNNE']
                     ))}
         )
 
+    heat_demand_max, heat_demand_rel = fix_profile(data['heat_demand'])
     heat_sink = solph.components.Sink(
         label='heat demand',
         inputs={
             hnw: solph.flows.Flow(
                 variable_costs=-param['param']['heat_price'],
-                nominal_value=data['heat_demand'].max(),
-                fix=data['heat_demand']/data['heat_demand'].max()
+                nominal_value=heat_demand_max,
+                fix=heat_demand_rel
                 )}
         )
 
@@ -133,43 +237,17 @@ def primary_network_invest(data, param, use_hp=True, return_unsolved=False):
 
     # %% Heat pump
     if use_hp:
-        for i in range(1, param['hp']['amount']+1):
-            hp = solph.components.OffsetConverter(
-                label=f'heat pump {i}',
-                inputs={
-                    enw: solph.flows.Flow(
-                        variable_costs=param['param']['elec_consumer_charges_self'],
-                    )
-                },
-                outputs={
-                    hnw: solph.flows.Flow(
-                        variable_costs=(
-                            param['hp']['op_cost_var'] - bew_op_bonus_Q_in_self
-                            ),
-                        investment=solph.Investment(
-                            ep_costs=(
-                                param['hp']['inv_spez_m'] / bwsf
-                                * (1 - param['param']['BEW'])
-                                ),
-                            maximum=param['hp']['cap_max'],
-                            minimum=param['hp']['cap_min'],
-                            offset=(
-                                param['hp']['inv_spez_b'] / bwsf
-                                * (1 - param['param']['BEW'])
-                                ),
-                            nonconvex=solph.NonConvex()
-                            ),
-                        max=data['hp_Q_max'],
-                        min=data['hp_Q_min'],
-                        nonconvex=solph.NonConvex()
-                        )
-                    },
-                coefficients=[data['hp_c_0'], data['hp_c_1']]
-                )
-
-            energy_system.add(hp)
+        energy_system.add(*_make_hps(
+            'hp', enw, hnw, data, param, bwsf, bew_op_bonus_Q_in_self,
+            el_variable_costs=param['param']['elec_consumer_charges_self']
+            ))
 
     # %% Combined cycle extraction turbine
+    ccet_eta_el = to_sequence(data['ccet_eta_el'])
+    ccet_eta_th = to_sequence(data['ccet_eta_th'])
+    ccet_Q_max = data['ccet_H_max'].to_numpy()*ccet_eta_th
+    # Status variables are only needed to enforce a minimal load
+    ccet_Q_min = data['ccet_H_min'].to_numpy()*ccet_eta_th
     ccet = solph.components.Converter(
         label='ccet',
         inputs={
@@ -186,49 +264,19 @@ def primary_network_invest(data, param, use_hp=True, return_unsolved=False):
                     minimum=param['ccet']['cap_min'],
                     nonconvex=solph.NonConvex()
                     ),
-                max=(data['ccet_H_max']*data['ccet_eta_th']),
-                min=(data['ccet_H_min']*data['ccet_eta_th']),
-                nonconvex=solph.NonConvex()
+                max=ccet_Q_max,
+                min=ccet_Q_min,
+                nonconvex=NONCONVEX if ccet_Q_min.any() else None
                 )
             },
         conversion_factors={
-            ccet_node: data['ccet_eta_el'],
-            hnw: data['ccet_eta_th']
+            ccet_node: ccet_eta_el,
+            hnw: ccet_eta_th
             }
         )
 
     energy_system.add(ccet)
 
-    # for i in [1, 2]:
-    #     ccet = solph.components.Converter(
-    #         label=f'ccet {i}',
-    #         inputs={
-    #             gnw: solph.flows.Flow()
-    #             },
-    #         outputs={
-    #             ccet_node: solph.flows.Flow(
-    #                 variable_costs=param['ccet']['op_cost_var']
-    #                 ),
-    #             hnw: solph.flows.Flow(
-    #                 investment=solph.Investment(
-    #                     ep_costs=(param['ccet']['inv_spez'] / bwsf),
-    #                     maximum=param['ccet']['cap_max'],
-    #                     minimum=param['ccet']['cap_min'],
-    #                     nonconvex=solph.NonConvex()
-    #                     ),
-    #                 max=(data['ccet_H_max']*data['ccet_eta_th']),
-    #                 min=(data['ccet_H_min']*data['ccet_eta_th']),
-    #                 nonconvex=solph.NonConvex()
-    #                 )
-    #             },
-    #         conversion_factors={
-    #             ccet_node: data['ccet_eta_el'],
-    #             hnw: data['ccet_eta_th']
-    #             }
-    #         )
-
-    #     energy_system.add(ccet)
-
     # %% Peak load boiler
     plb = solph.components.Converter(
         label='peak load boiler',
@@ -282,64 +330,22 @@ def primary_network_invest(data, param, use_hp=True, return_unsolved=False):
 
     # %% Auxillary components
     ccet_P_N = (
-        (data['heat_demand'].max() * 1/3)
-        / data['ccet_eta_th'].mean()
-        * data['ccet_eta_el'].mean()
+        (heat_demand_max * 1/3)
+        / np.mean(ccet_eta_th)
+        * np.mean(ccet_eta_el)
         )
     ccet_chp_bonus = param['param']['chp_bonus']
 
-    ccet_with_chp_bonus = solph.components.Converter(
-        label='ccet with chp bonus',
-        inputs={ccet_node: solph.flows.Flow()},
-        outputs={
-            spotmarket_node: solph.flows.Flow(
-                nominal_value=ccet_P_N,
-                max=1.0,
-                min=0.0,
-                full_load_time_max=param['param']['h_max_chp_bonus'],
-                variable_costs=(
-                    -ccet_chp_bonus - param['param']['TEHG_bonus'])
-                )},
-        conversion_factors={enw: 1}
+    # Maximal electricity output of the ccet instead of an arbitrary large
+    # value, it never restricts the split but tightens the LP relaxation
+    ccet_P_max = param['ccet']['cap_max'] * np.max(
+        data['ccet_H_max'].to_numpy() * ccet_eta_el
         )
 
-    ccet_no_chp_bonus = solph.components.Converter(
-        label='ccet no chp bonus',
-        inputs={ccet_node: solph.Flow()},
-        outputs={ccet_no_bonus_node: solph.Flow(
-            nominal_value=9999,
-            max=1.0,
-            min=0.0
-            )},
-        conversion_factors={ccet_no_bonus_node: 1}
-        )
-
-    ccet_no_chp_bonus_int = solph.components.Converter(
-        label='ccet no chp bonus internally',
-        inputs={ccet_no_bonus_node: solph.Flow()},
-        outputs={enw: solph.Flow(
-            nominal_value=9999,
-            max=1.0,
-            min=0.0
-            )},
-        conversion_factors={enw: 1}
-        )
-
-    ccet_no_chp_bonus_ext = solph.components.Converter(
-        label='ccet no chp bonus externally',
-        inputs={ccet_no_bonus_node: solph.Flow()},
-        outputs={spotmarket_node: solph.Flow(
-            nominal_value=9999,
-            max=1.0,
-            min=0.0
-            )},
-        conversion_factors={spotmarket_node: 1}
-        )
-
-    energy_system.add(
-        ccet_with_chp_bonus, ccet_no_chp_bonus,
-        ccet_no_chp_bonus_int, ccet_no_chp_bonus_ext
-        )
+    energy_system.add(*chp_bonus_converters(
+        'ccet', ccet_node, enw, spotmarket_node, ccet_P_N, ccet_P_max,
+        ccet_chp_bonus, param
+        ))
 
     # %% Return unsolved
     if return_unsolved:
@@ -348,26 +354,10 @@ def primary_network_invest(data, param, use_hp=True, return_unsolved=False):
     # %% Solve
     model = solph.Model(energy_system)
     # model.write('my_model.lp', io_options={'symbolic_solver_labels': True})
-    solveroptions = {}
-    if 'mipgap' in param['param'].keys():
-        solveroptions['MIPGap'] = param['param']['mipgap']
-    if 'TimeLimit' in param['param'].keys():
-        solveroptions['TimeLimit'] = param['param']['TimeLimit']
-    if 'MIPFocus' in param['param'].keys():
-        solveroptions['MIPFocus'] = param['param']['MIPFocus']
-    if 'SolverLogPath' in param['param'].keys():
-        solveroptions['LogFile'] = param['param']['SolverLogPath']
-    if 'ResultFile' in param['param'].keys():
-        solveroptions['ResultFile'] = param['param']['ResultFile']
-    if 'InputFile' in param['param'].keys():
-        solveroptions['InputFile'] = param['param']['InputFile']
-    model.solve(
-        solver='gurobi', solve_kwargs={'tee': True},
-        cmdline_options=solveroptions
-        )
+    solve_model(model, param)
 
     # Ergebnisse in results
-    results = solph.processing.results(model)
+    results = _results(model, param)
 
     # Metaergebnisse
     meta_results = solph.processing.meta_results(model)
@@ -393,16 +383,21 @@ def sub_network_invest(data, param, **kwargs):
         param['param']['capital_interest'], param['param']['lifetime']
         )
 
+    if param['param']['use_BEW_op_bonus']:
+        bew_el_cost = calc_bew_el_cost_prim(data, param)
+        bew_op_bonus_Q_in_self = bew_el_cost[1]
+    else:
+        bew_el_cost = None
+        bew_op_bonus_Q_in_self = 0
+
     energy_system = primary_network(
-        data, param, use_hp=False, return_unsolved=True
+        data, param, use_hp=False, return_unsolved=True,
+        bew_el_cost=bew_el_cost
         )
 
     # %% Connection to primary network
-    for obj in energy_system.__dict__['_nodes']:
-        if obj.label == 'heat network':
-            prim_hnw = obj
-        if obj.label == 'electricity network':
-            prim_enw = obj
+    prim_hnw = energy_system.groups['heat network']
+    prim_enw = energy_system.groups['electricity network']
 
     # %% Busses
     sub_enw = solph.Bus(label='sub electricity network')
@@ -417,7 +412,7 @@ def sub_network_invest(data, param, **kwargs):
             sub_enw: solph.flows.Flow(
                 variable_costs=(
                     param['param']['elec_consumer_charges_grid']
-                    + data['el_spot_price']
+                    + data['el_spot_price'].to_numpy()
                     )
                 )
             }
@@ -426,61 +421,24 @@ def sub_network_invest(data, param, **kwargs):
     energy_system.add(sub_elec_source)
 
     # %% Sinks
+    sub_heat_demand_max, sub_heat_demand_rel = fix_profile(data['sub_heat_demand'])
     sub_heat_sink = solph.components.Sink(
         label='sub network heat demand',
         inputs={
             sub_hnw: solph.flows.Flow(
                 variable_costs=-param['param']['heat_price'],
-                nominal_value=data['sub_heat_demand'].max(),
-                fix=data['sub_heat_demand']/data['sub_heat_demand'].max()
+                nominal_value=sub_heat_demand_max,
+                fix=sub_heat_demand_rel
                 )}
         )
 
     energy_system.add(sub_heat_sink)
 
     # %% Primary Network Heat pump
-    if param['param']['use_BEW_op_bonus']:
-        _, bew_op_bonus_Q_in_self = calc_bew_el_cost_prim(
-            data, param
-            )
-    else:
-        bew_op_bonus_Q_in_self = 0
-
-    for i in range(1, param['hp']['amount']+1):
-        hp = solph.components.OffsetConverter(
-            label=f'heat pump {i}',
-            inputs={
-                prim_enw: solph.flows.Flow(
-                    variable_costs=param['param']['elec_consumer_charges_self'],
-                )
-            },
-            outputs={
-                prim_hnw: solph.flows.Flow(
-                    variable_costs=(
-                        param['hp']['op_cost_var'] - bew_op_bonus_Q_in_self
-                        ),
-                    investment=solph.Investment(
-                        ep_costs=(
-                            param['hp']['inv_spez_m'] / bwsf
-                            * (1 - param['param']['BEW'])
-                            ),
-                        maximum=param['hp']['cap_max'],
-                        minimum=param['hp']['cap_min'],
-                        offset=(
-                            param['hp']['inv_spez_b'] / bwsf
-                            * (1 - param['param']['BEW'])
-                            ),
-                        nonconvex=solph.NonConvex()
-                        ),
-                    max=data['hp_Q_max'],
-                    min=data['hp_Q_min'],
-                    nonconvex=solph.NonConvex()
-                    )
-                },
-            coefficients=[data['hp_c_0'], data['hp_c_1']]
-            )
-
-        energy_system.add(hp)
+    energy_system.add(*_make_hps(
+        'hp', prim_enw, prim_hnw, data, param, bwsf, bew_op_bonus_Q_in_self,
+        el_variable_costs=param['param']['elec_consumer_charges_self']
+        ))
 
     # %% Sub Network Heat Pump
     if param['param']['use_BEW_op_bonus']:
@@ -488,40 +446,9 @@ def sub_network_invest(data, param, **kwargs):
     else:
         bew_op_bonus_Q_in = 0
 
-
-    for i in range(1, param['sub hp']['amount']+1):
-        sub_hp = solph.components.OffsetConverter(
-            label=f'sub heat pump {i}',
-            inputs={
-                sub_enw: solph.flows.Flow()
-            },
-            outputs={
-                sub_hnw: solph.flows.Flow(
-                    variable_costs=(
-                        param['sub hp']['op_cost_var'] - bew_op_bonus_Q_in
-                        ),
-                    investment=solph.Investment(
-                        ep_costs=(
-                            param['sub hp']['inv_spez_m'] / bwsf
-                            * (1 - param['param']['BEW'])
-                            ),
-                        maximum=param['sub hp']['cap_max'],
-                        minimum=param['sub hp']['cap_min'],
-                        offset=(
-                            param['sub hp']['inv_spez_b'] / bwsf
-                            * (1 - param['param']['BEW'])
-                            ),
-                        nonconvex=solph.NonConvex()
-                        ),
-                    max=data['sub_hp_Q_max'],
-                    min=data['sub_hp_Q_min'],
-                    nonconvex=solph.NonConvex()
-                    )
-                },
-            coefficients=[data['sub_hp_c_0'], data['sub_hp_c_1']]
-            )
-
-        energy_system.add(sub_hp)
+    energy_system.add(*_make_hps(
+        'sub hp', sub_enw, sub_hnw, data, param, bwsf, bew_op_bonus_Q_in
+        ))
 
     # %% Short term storage
     sub_st_tes = solph.components.GenericStorage(
@@ -573,26 +500,10 @@ def sub_network_invest(data, param, **kwargs):
     # %% Solve
     model = solph.Model(energy_system)
     # model.write('my_model.lp', io_options={'symbolic_solver_labels': True})
-    solveroptions = {}
-    if 'mipgap' in param['param'].keys():
-        solveroptions['MIPGap'] = param['param']['mipgap']
-    if 'TimeLimit' in param['param'].keys():
-        solveroptions['TimeLimit'] = param['param']['TimeLimit']
-    if 'MIPFocus' in param['param'].keys():
-        solveroptions['MIPFocus'] = param['param']['MIPFocus']
-    if 'SolverLogPath' in param['param'].keys():
-        solveroptions['LogFile'] = param['param']['SolverLogPath']
-    if 'ResultFile' in param['param'].keys():
-        solveroptions['ResultFile'] = param['param']['ResultFile']
-    if 'InputFile' in param['param'].keys():
-        solveroptions['InputFile'] = param['param']['InputFile']
-    model.solve(
-        solver='gurobi', solve_kwargs={'tee': True},
-        cmdline_options=solveroptions
-        )
+    solve_model(model, param)
 
     # Ergebnisse in results
-    results = solph.processing.results(model)
+    results = _results(model, param)
 
     # Metaergebnisse
     meta_results = solph.processing.meta_results(model)
@@ -626,10 +537,11 @@ def IVgdh_network_invest(data, param):
     bwsf = calc_bwsf(
         param['param']['capital_interest'], param['param']['lifetime']
         )
+    # Share of the investment cost not covered by the BEW funding
+    bew_share = 1 - param['param']['BEW']
 
     # %% Create time index
-    periods = len(data)
-    date_time_index = pd.date_range(data.index[0], periods=periods, freq='h')
+    date_time_index = time_index(data)
 
     # %% Create energy system
     energy_system = solph.EnergySystem(
@@ -642,13 +554,12 @@ def IVgdh_network_invest(data, param):
     hnw = solph.Bus(label='heat network')
 
     ice_node = solph.Bus(label='ice node')
-    ice_no_bonus_node = solph.Bus(label='ice no bonus node')
     spotmarket_node = solph.Bus(label='spotmarket node')
 
     sol_node = solph.Bus(label='solar node')
 
     energy_system.add(
-        bnw, enw, hnw, ice_node, ice_no_bonus_node, spotmarket_node, sol_node
+        bnw, enw, hnw, ice_node, spotmarket_node, sol_node
         )
 
     # %% Sources
@@ -657,37 +568,25 @@ def IVgdh_network_invest(data, param):
         outputs={
             bnw: solph.flows.Flow(
                 variable_costs=(
-                    data['biogas_price']
-                    + data['co2_price'] * param['param']['ef_biogas']
+                    data['biogas_price'].to_numpy()
+                    + (data['co2_price'].to_numpy()
+                       * param['param']['ef_biogas'])
                     )
                 )
             }
         )
 
     # BEW operational bonus
-    if param['param']['use_BEW_op_bonus']:
-        bew_op_bonus_Q_in_grid, bew_op_bonus_Q_in_self = calc_bew_el_cost_prim(
-            data, param
-            )
-    else:
-        bew_op_bonus_Q_in_grid = 0
-        bew_op_bonus_Q_in_self = 0
-
-    hp_P_max = (data['hp_Q_max'] - data['hp_c_0']) / data['hp_c_1']
+    elec_source_cost, bew_op_bonus_Q_in_self = calc_elec_source_cost(
+        data, param
+        )
 
     elec_source = solph.components.Source(
         label='electricity source',
         outputs={
             enw: solph.flows.Flow(
-                variable_costs=(
-                    param['param']['elec_consumer_charges_grid']
-                    - param['param']['elec_consumer_charges_self']
-                    + data['el_spot_price']
-                    + (data['hp_Q_max'] / hp_P_max) * (
-                        - bew_op_bonus_Q_in_grid
-                        + bew_op_bonus_Q_in_self
-                        )
-                    ))}
+                variable_costs=elec_source_cost
+                )}
         )
 
     solar_source = solph.components.Source(
@@ -700,17 +599,15 @@ def IVgdh_network_invest(data, param):
                     ),
                 nominal_value=solph.Investment(
                     ep_costs=(
-                        param['sol']['inv_spez_m'] / bwsf
-                        * (1 - param['param']['BEW'])
+                        param['sol']['inv_spez_m'] / bwsf * bew_share
                         ),
                     offset=(
-                        param['sol']['inv_spez_b'] / bwsf
-                        * (1 - param['param']['BEW'])
+                        param['sol']['inv_spez_b'] / bwsf * bew_share
                         ),
                     maximum=param['sol']['cap_max'],
                     nonconvex=solph.NonConvex()
                 ),
-                fix=data['solar_heat_flow']
+                fix=data['solar_heat_flow'].to_numpy()
             )}
         )
 
@@ -722,61 +619,35 @@ def IVgdh_network_invest(data, param):
         inputs={
             spotmarket_node: solph.flows.Flow(
                 variable_costs=(
-                    -data['el_spot_price'] - param['param']['vNNE']
+                    -data['el_spot_price'].to_numpy() - param['param']['vNNE']
                     ))}
         )
 
+    heat_demand_max, heat_demand_rel = fix_profile(data['heat_demand'])
     heat_sink = solph.components.Sink(
         label='heat demand',
         inputs={
             hnw: solph.flows.Flow(
                 variable_costs=-param['param']['heat_price'],
-                nominal_value=data['heat_demand'].max(),
-                fix=data['heat_demand']/data['heat_demand'].max()
+                nominal_value=heat_demand_max,
+                fix=heat_demand_rel
                 )}
         )
 
     energy_system.add(elec_sink, heat_sink)
 
     # %% Heat pump
-    for i in range(1, param['hp']['amount']+1):
-        # Heat pump component
-        hp = solph.components.OffsetConverter(
-            label=f'heat pump {i}',
-            inputs={
-                enw: solph.flows.Flow(
-                    variable_costs=(
-                        param['param']['elec_consumer_charges_self'])
-                    )},
-            outputs={
-                hnw: solph.flows.Flow(
-                    variable_costs=(
-                        param['hp']['op_cost_var'] - bew_op_bonus_Q_in_self
-                        ),
-                    investment=solph.Investment(
-                        ep_costs=(
-                            param['hp']['inv_spez_m'] / bwsf
-                            * (1 - param['param']['BEW'])
-                            ),
-                        maximum=param['hp']['cap_max'],
-                        minimum=param['hp']['cap_min'],
-                        offset=(
-                            param['hp']['inv_spez_b'] / bwsf
-                            * (1 - param['param']['BEW'])
-                            ),
-                        nonconvex=solph.NonConvex()
-                        ),
-                    max=data['hp_Q_max'],
-                    min=data['hp_Q_min'],
-                    nonconvex=solph.NonConvex()
-                    )
-                },
-            coefficients=[data['hp_c_0'], data['hp_c_1']]
-            )
-
-        energy_system.add(hp)
+    energy_system.add(*_make_hps(
+        'hp', enw, hnw, data, param, bwsf, bew_op_bonus_Q_in_self,
+        el_variable_costs=param['param']['elec_consumer_charges_self']
+        ))
 
     # %% Internal extraction engine
+    ice_eta_el = to_sequence(data['ice_eta_el'])
+    ice_eta_th = to_sequence(data['ice_eta_th'])
+    ice_Q_max = data['ice_H_max'].to_numpy()*ice_eta_th
+    # Status variables are only needed to enforce a minimal load
+    ice_Q_min = data['ice_H_min'].to_numpy()*ice_eta_th
     ice = solph.components.Converter(
         label='ice',
         inputs={
@@ -789,21 +660,20 @@ def IVgdh_network_invest(data, param):
             hnw: solph.flows.Flow(
                 investment=solph.Investment(
                     ep_costs=(
-                        param['ice']['inv_spez'] / bwsf
-                        * (1 - param['param']['BEW'])
+                        param['ice']['inv_spez'] / bwsf * bew_share
                         ),
                     maximum=param['ice']['cap_max'],
                     minimum=param['ice']['cap_min'],
                     nonconvex=solph.NonConvex()
                     ),
-                max=(data['ice_H_max']*data['ice_eta_th']),
-                min=(data['ice_H_min']*data['ice_eta_th']),
-                nonconvex=solph.NonConvex()
+                max=ice_Q_max,
+                min=ice_Q_min,
+                nonconvex=NONCONVEX if ice_Q_min.any() else None
                 )
             },
         conversion_factors={
-            ice_node: data['ice_eta_el'],
-            hnw: data['ice_eta_th']
+            ice_node: ice_eta_el,
+            hnw: ice_eta_th
             }
         )
 
@@ -840,88 +710,30 @@ def IVgdh_network_invest(data, param):
 
     # %% Auxillary components
     ice_P_N = (
-        (data['heat_demand'].max() * 1/3)
-        / data['ice_eta_th'].mean()
-        * data['ice_eta_el'].mean()
+        (heat_demand_max * 1/3)
+        / np.mean(ice_eta_th)
+        * np.mean(ice_eta_el)
         )
     ice_chp_bonus = param['param']['chp_bonus']
 
-    ice_with_chp_bonus = solph.components.Converter(
-        label='ice with chp bonus',
-        inputs={ice_node: solph.flows.Flow()},
-        outputs={
-            spotmarket_node: solph.flows.Flow(
-                nominal_value=ice_P_N,
-                max=1.0,
-                min=0.0,
-                full_load_time_max=param['param']['h_max_chp_bonus'],
-                variable_costs=(
-                    -ice_chp_bonus - param['param']['TEHG_bonus'])
-                )},
-        conversion_factors={enw: 1}
+    # Maximal electricity output of the ice instead of an arbitrary large
+    # value, it never restricts the split but tightens the LP relaxation
+    ice_P_max = param['ice']['cap_max'] * np.max(
+        data['ice_H_max'].to_numpy() * ice_eta_el
         )
 
-    ice_no_chp_bonus = solph.components.Converter(
-        label='ice no chp bonus',
-        inputs={ice_node: solph.flows.Flow()},
-        outputs={ice_no_bonus_node: solph.flows.Flow(
-            nominal_value=9999,
-            max=1.0,
-            min=0.0
-            )},
-        conversion_factors={ice_no_bonus_node: 1}
-        )
-
-    ice_no_chp_bonus_int = solph.components.Converter(
-        label='ice no chp bonus internally',
-        inputs={ice_no_bonus_node: solph.Flow()},
-        outputs={enw: solph.Flow(
-            nominal_value=9999,
-            max=1.0,
-            min=0.0
-            )},
-        conversion_factors={enw: 1}
-        )
-
-    ice_no_chp_bonus_ext = solph.components.Converter(
-        label='ice no chp bonus externally',
-        inputs={ice_no_bonus_node: solph.Flow()},
-        outputs={spotmarket_node: solph.Flow(
-            nominal_value=9999,
-            max=1.0,
-            min=0.0
-            )},
-        conversion_factors={spotmarket_node: 1}
-        )
-
-    energy_system.add(
-        ice_with_chp_bonus, ice_no_chp_bonus,
-        ice_no_chp_bonus_int, ice_no_chp_bonus_ext
-        )
+    energy_system.add(*chp_bonus_converters(
+        'ice', ice_node, enw, spotmarket_node, ice_P_N, ice_P_max,
+        ice_chp_bonus, param
+        ))
 
     # %% Solve
     model = solph.Model(energy_system)
     # model.write('my_model.lp', io_options={'symbolic_solver_labels': True})
-    solveroptions = {}
-    if 'mipgap' in param['param'].keys():
-        solveroptions['MIPGap'] = param['param']['mipgap']
-    if 'TimeLimit' in param['param'].keys():
-        solveroptions['TimeLimit'] = param['param']['TimeLimit']
-    if 'MIPFocus' in param['param'].keys():
-        solveroptions['MIPFocus'] = param['param']['MIPFocus']
-    if 'SolverLogPath' in param['param'].keys():
-        solveroptions['LogFile'] = param['param']['SolverLogPath']
-    if 'ResultFile' in param['param'].keys():
-        solveroptions['ResultFile'] = param['param']['ResultFile']
-    if 'InputFile' in param['param'].keys():
-        solveroptions['InputFile'] = param['param']['InputFile']
-    model.solve(
-        solver='gurobi', solve_kwargs={'tee': True},
-        cmdline_options=solveroptions
-        )
+    solve_model(model, param)
 
     # Ergebnisse in results
-    results = solph.processing.results(model)
+    results = _results(model, param)
 
     # Metaergebnisse
     meta_results = solph.processing.meta_results(model)
@@ -1,55 +1,317 @@
+import hashlib
+import json
+import os
+import pickle
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
 from eco_funcs import bew_op_bonus
 
 
-def calc_bew_el_cost_prim(data, param):
-    hp_P_max = (data['hp_Q_max'] - data['hp_c_0']) / data['hp_c_1']
-    SCOP = data['hp_Q_max'].mean() / hp_P_max.mean()
+def _bew_op_bonus_Q_in(Q_max, c_0, c_1):
+    """Calculate BEW bonus per heat output and maximum COP of a heat pump."""
+    P_max = Q_max - c_0
+    P_max /= c_1
+    SCOP = Q_max.mean() / P_max.mean()
     bew_op_bonus_Q_in = (
         bew_op_bonus(SCOP, el_source_type='conventional')
-        * (data['hp_Q_max']-hp_P_max)/data['hp_Q_max']
+        * (Q_max-P_max)/Q_max
+        )
+
+    return bew_op_bonus_Q_in, Q_max / P_max
+
+
+def calc_bew_el_cost_prim(data, param):
+    bew_op_bonus_Q_in, COP_max = _bew_op_bonus_Q_in(
+        data['hp_Q_max'].to_numpy(), data['hp_c_0'].to_numpy(),
+        data['hp_c_1'].to_numpy()
         )
 
     el_cost_per_Q_out_grid = (
-        (data['el_spot_price']+param['param']['elec_consumer_charges_grid'])
-        / (data['hp_Q_max'] / hp_P_max)
+        (data['el_spot_price'].to_numpy()
+         + param['param']['elec_consumer_charges_grid'])
+        / COP_max
         )
     el_cost_per_Q_out_self = (
-        param['param']['elec_consumer_charges_self']
-        / (data['hp_Q_max'] / hp_P_max)
+        param['param']['elec_consumer_charges_self'] / COP_max
         )
 
-    bew_op_bonus_Q_in_grid = bew_op_bonus_Q_in.copy()
-    bew_op_bonus_Q_in_self = bew_op_bonus_Q_in.copy()
-
-    for idx in bew_op_bonus_Q_in.index:
-        bew_op_bonus_Q_in_grid[idx] = min(
-            bew_op_bonus_Q_in_grid[idx],
-            max(0, 0.9*el_cost_per_Q_out_grid[idx])
-            )
-        bew_op_bonus_Q_in_self[idx] = min(
-            bew_op_bonus_Q_in_self[idx],
-            max(0, 0.9*el_cost_per_Q_out_self[idx])
-            )
+    bew_op_bonus_Q_in_grid = pd.Series(
+        np.minimum(
+            bew_op_bonus_Q_in, np.maximum(0, 0.9*el_cost_per_Q_out_grid)
+            ),
+        index=data.index
+        )
+    bew_op_bonus_Q_in_self = pd.Series(
+        np.minimum(
+            bew_op_bonus_Q_in, np.maximum(0, 0.9*el_cost_per_Q_out_self)
+            ),
+        index=data.index
+        )
 
     return bew_op_bonus_Q_in_grid, bew_op_bonus_Q_in_self
 
+
 def calc_bew_el_cost_sub(data, param):
-    sub_hp_P_max = (data['sub_hp_Q_max'] - data['sub_hp_c_0']) / data['sub_hp_c_1']
-    SCOP = data['sub_hp_Q_max'].mean() / sub_hp_P_max.mean()
-    bew_op_bonus_Q_in = (
-        bew_op_bonus(SCOP, el_source_type='conventional')
-        * (data['sub_hp_Q_max']-sub_hp_P_max)/data['sub_hp_Q_max']
+    bew_op_bonus_Q_in, COP_max = _bew_op_bonus_Q_in(
+        data['sub_hp_Q_max'].to_numpy(), data['sub_hp_c_0'].to_numpy(),
+        data['sub_hp_c_1'].to_numpy()
         )
 
     el_cost_per_Q_out = (
-        (data['el_spot_price']+param['param']['elec_consumer_charges_grid'])
-        / (data['sub_hp_Q_max'] / sub_hp_P_max)
+        (data['el_spot_price'].to_numpy()
+         + param['param']['elec_consumer_charges_grid'])
+        / COP_max
+        )
+
+    return pd.Series(
+        np.minimum(bew_op_bonus_Q_in, np.maximum(0, 0.9*el_cost_per_Q_out)),
+        index=data.index
+        )
+
+
+def calc_elec_source_cost(data, param, bew_el_cost=None,
+                          use_bew_op_bonus=None):
+    """
+    Calculate the variable cost of grid electricity for the primary network.
+
+    With the BEW operating bonus, the cost is corrected by the difference of
+    the bonus for grid and self generated electricity per electricity input
+    of the heat pumps.
+
+    Parameters
+    ----------
+
+    data : pandas.DataFrame
+        Input time series parameters.
+
+    param : dict
+        Constant input parameters.
+
+    bew_el_cost : tuple
+        Already calculated result of `calc_bew_el_cost_prim`. (Default: 'None')
+
+    use_bew_op_bonus : bool
+        Overrides param['param']['use_BEW_op_bonus'] if set. (Default: 'None')
+
+    Returns
+    -------
+
+    elec_source_cost : numpy.ndarray
+        Variable cost of grid electricity.
+
+    bew_op_bonus_Q_in_self : numpy.ndarray or int
+        BEW bonus per heat output for self generated electricity or 0 if the
+        bonus is not used.
+    """
+    elec_source_cost = (
+        param['param']['elec_consumer_charges_grid']
+        - param['param']['elec_consumer_charges_self']
+        + data['el_spot_price'].to_numpy()
+        )
+
+    if use_bew_op_bonus is None:
+        use_bew_op_bonus = param['param']['use_BEW_op_bonus']
+    if not use_bew_op_bonus:
+        return elec_source_cost, 0
+
+    if bew_el_cost is None:
+        bew_el_cost = calc_bew_el_cost_prim(data, param)
+    bew_op_bonus_Q_in_grid, bew_op_bonus_Q_in_self = (
+        bonus.to_numpy() for bonus in bew_el_cost
+        )
+    hp_Q_max = data['hp_Q_max'].to_numpy()
+    hp_P_max = hp_Q_max - data['hp_c_0'].to_numpy()
+    hp_P_max /= data['hp_c_1'].to_numpy()
+
+    # In place operations avoid a temporary array per step
+    bonus_diff = bew_op_bonus_Q_in_self - bew_op_bonus_Q_in_grid
+    bonus_diff *= hp_Q_max / hp_P_max
+    elec_source_cost += bonus_diff
+
+    return elec_source_cost, bew_op_bonus_Q_in_self
+
+
+def to_sequence(series):
+    """Return a time series as scalar if it is constant, else as array.
+
+    solph keeps scalar attributes as a single value instead of one value per
+    time step.
+    """
+    values = series.to_numpy()
+    if (values == values[0]).all():
+        return float(values[0])
+    return values
+
+
+@lru_cache(maxsize=16)
+def _hourly_index(start, periods):
+    return pd.date_range(start, periods=periods, freq='h')
+
+
+def time_index(data):
+    """Return the hourly time index of the input data.
+
+    The index is cached, so repeated and nested energy systems of the same
+    data share one DatetimeIndex instead of building it again.
+    """
+    return _hourly_index(data.index[0], len(data))
+
+
+def fix_profile(series):
+    """Return maximum and relative profile of a fixed time series.
+
+    A series without positive values yields a profile of zeros instead of
+    dividing by zero.
+    """
+    values = np.asarray(series, dtype=float)
+    values_max = values.max()
+    if values_max > 0:
+        return values_max, values / values_max
+    return values_max, np.zeros_like(values)
+
+
+def read_data(datafile):
+    """Read time dependent input data indexed by its timestamps.
+
+    The timestamps are parsed with their explicit format, so pandas does not
+    have to infer it and can convert the whole index in one pass.
+    """
+    data = pd.read_csv(datafile, sep=';', index_col=0)
+    data.index = pd.to_datetime(data.index, format='%Y-%m-%d %H:%M:%S')
+    return data
+
+
+# Solver parameters set by optional keys of param['param']
+_SOLVER_KEY_MAP = {
+    'gurobi': {
+        'mipgap': 'MIPGap',
+        'TimeLimit': 'TimeLimit',
+        'MIPFocus': 'MIPFocus',
+        'Threads': 'Threads',
+        'SolverLogPath': 'LogFile',
+        'ResultFile': 'ResultFile',
+        'InputFile': 'InputFile'
+        },
+    'highs': {
+        'mipgap': 'mip_rel_gap',
+        'TimeLimit': 'time_limit',
+        'Threads': 'threads',
+        'SolverLogPath': 'log_file'
+        }
+    }
+
+
+def solver_options(param, solver='gurobi'):
+    """Collect the solver options of a model from its parameters."""
+    solveroptions = {
+        solver_key: param['param'][key]
+        for key, solver_key in _SOLVER_KEY_MAP[solver].items()
+        if key in param['param']
+        }
+    if solver == 'gurobi':
+        # Further Gurobi parameters, e.g. {'Method': 2, 'Crossover': 0}
+        solveroptions.update(param['param'].get('gurobi', {}))
+    return solveroptions
+
+
+def solve_model(model, param, verbose=False):
+    """
+    Solve a model with the solver set in param['param'].
+
+    Gurobi is used by default. With 'solver': 'highs' the open source HiGHS
+    solver is called through its Python interface, e.g. without a Gurobi
+    license. Gurobi specific options are ignored then.
+
+    Parameters
+    ----------
+
+    model : oemof.solph.Model
+        Model of the energy system to solve.
+
+    param : dict
+        Constant input parameters.
+
+    verbose : bool
+        Flag to set 'True' if the solver log should be printed, unless
+        param['param']['verbose'] sets it. (Default: 'False')
+    """
+    solver = param['param'].get('solver', 'gurobi')
+    if solver == 'gurobi':
+        solver_io = param['param'].get('solver_io', 'lp')
+    else:
+        solver_io = None
+
+    # Solver log on the console only on request, see 'SolverLogPath'
+    model.solve(
+        solver=solver, solver_io=solver_io,
+        solve_kwargs={'tee': param['param'].get('verbose', verbose)},
+        cmdline_options=solver_options(param, solver=solver)
+        )
+
+
+# Parameters that only control the solver run and not the optimal solution
+_SOLVER_RUN_KEYS = (
+    'SolverLogPath', 'Threads', 'ResultFile', 'InputFile', 'verbose',
+    'solver_io'
+    )
+
+
+def input_hash(data, param, *args):
+    """Return a hash of the data, parameters and further arguments of a model.
+
+    Parameters that only control the solver run are ignored, so a different
+    log file or number of threads reuses the result.
+    """
+    param = dict(param)
+    param['param'] = {
+        k: v for k, v in param['param'].items() if k not in _SOLVER_RUN_KEYS
+        }
+    sha = hashlib.sha256()
+    sha.update(data.to_csv().encode())
+    sha.update(json.dumps([param, args], sort_keys=True).encode())
+    return sha.hexdigest()
+
+
+def solve_cached(es_func, data, param, *args, cachedir=None):
+    """
+    Solve an energy system or reuse the results of an identical earlier run.
+
+    Parameters
+    ----------
+
+    es_func : function
+        Function that builds and solves the energy system and returns
+        results and meta results.
+
+    data : pandas.DataFrame
+        Input time series parameters.
+
+    param : dict
+        Constant input parameters.
+
+    args
+        Further positional arguments of `es_func`.
+
+    cachedir : str
+        Directory of the pickled results. Without it, the energy system is
+        always solved. (Default: 'None')
+    """
+    if cachedir is None:
+        return es_func(data, param, *args)
+
+    cachefile = os.path.join(
+        cachedir, f'{es_func.__name__}_{input_hash(data, param, *args)}.pkl'
         )
+    if os.path.exists(cachefile):
+        print(f'Reusing cached results from {cachefile}')
+        with open(cachefile, 'rb') as file:
+            return pickle.load(file)
 
-    for idx in bew_op_bonus_Q_in.copy().index:
-        bew_op_bonus_Q_in[idx] = min(
-            bew_op_bonus_Q_in[idx],
-            max(0, 0.9*el_cost_per_Q_out[idx])
-            )
+    results, meta_results = es_func(data, param, *args)
+    os.makedirs(cachedir, exist_ok=True)
+    with open(cachefile, 'wb') as file:
+        pickle.dump((results, meta_results), file)
 
-    return bew_op_bonus_Q_in
+    return results, meta_results
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 
+import os
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
-from eco_funcs import (LCOH, bew_op_bonus, chp_bonus, emission_calc,
-                       invest_stes, npv)
+from eco_funcs import LCOH, chp_bonus, emission_calc, npv
 from helpers import calc_bew_el_cost_prim, calc_bew_el_cost_sub
 from oemof.solph import views
 
@@ -39,7 +41,6 @@ def primary_network_invest(results, meta_results, data, param, use_hp):
     data_enw = views.node(results, 'electricity network')['sequences']
     data_hnw = views.node(results, 'heat network')['sequences']
     data_ccet_node = views.node(results, 'ccet node')['sequences']
-    data_ccet_no_bonus_node = views.node(results, 'ccet no bonus node')['sequences']
     data_spotmarket_node = views.node(results, 'spotmarket node')['sequences']
     data_st_tes = views.node(results, 'st-tes')['sequences']
 
@@ -50,8 +51,8 @@ def primary_network_invest(results, meta_results, data, param, use_hp):
 
     # Combine all data and relabel the column names
     data_all = pd.concat(
-        [data_gnw, data_enw, data_hnw, data_ccet_node, data_ccet_no_bonus_node,
-         data_spotmarket_node, data_st_tes],
+        [data_gnw, data_enw, data_hnw, data_ccet_node, data_spotmarket_node,
+         data_st_tes],
         axis=1
         )
     result_labeling(data_all)
@@ -336,7 +337,6 @@ def sub_network_invest(results, meta_results, data, param, **kwargs):
     data_sub_enw = views.node(results, 'sub electricity network')['sequences']
     data_sub_hnw = views.node(results, 'sub heat network')['sequences']
     data_ccet_node = views.node(results, 'ccet node')['sequences']
-    data_ccet_no_bonus_node = views.node(results, 'ccet no bonus node')['sequences']
     data_spotmarket_node = views.node(results, 'spotmarket node')['sequences']
     data_st_tes = views.node(results, 'st-tes')['sequences']
     data_sub_st_tes = views.node(results, 'sub st-tes')['sequences']
@@ -350,8 +350,7 @@ def sub_network_invest(results, meta_results, data, param, **kwargs):
     # Combine all data and relabel the column names
     data_all = pd.concat(
         [data_gnw, data_enw, data_hnw, data_sub_enw, data_sub_hnw,
-         data_ccet_node, data_ccet_no_bonus_node, data_spotmarket_node,
-         data_st_tes, data_sub_st_tes],
+         data_ccet_node, data_spotmarket_node, data_st_tes, data_sub_st_tes],
         axis=1
         )
     result_labeling(data_all)
@@ -708,7 +707,6 @@ def IVgdh_network_invest(results, meta_results, data, param):
     data_enw = views.node(results, 'electricity network')['sequences']
     data_hnw = views.node(results, 'heat network')['sequences']
     data_ice_node = views.node(results, 'ice node')['sequences']
-    data_ice_no_bonus_node = views.node(results, 'ice no bonus node')['sequences']
     data_spotmarket_node = views.node(results, 'spotmarket node')['sequences']
     data_s_tes = views.node(results, 's-tes')['sequences']
 
@@ -719,7 +717,7 @@ def IVgdh_network_invest(results, meta_results, data, param):
 
     # Combine all data and relabel the column names
     data_all = pd.concat(
-        [data_bnw, data_enw, data_hnw, data_ice_node, data_ice_no_bonus_node,
+        [data_bnw, data_enw, data_hnw, data_ice_node,
          data_spotmarket_node, data_s_tes],
         axis=1
         )
@@ -976,6 +974,26 @@ def IVgdh_network_invest(results, meta_results, data, param):
     return data_all, data_caps, key_params, cost_df
 
 
+@lru_cache(maxsize=None)
+def load_labeldict(labeldictpath):
+    """
+    Read the labeldict csv file once and map result labels to column names.
+
+    Parameters
+    ----------
+
+    labeldictpath : str
+        Path to the labeldict csv file.
+    """
+    labeldict_csv = pd.read_csv(labeldictpath, sep=';', na_filter=False)
+
+    return dict(zip(
+        zip(zip(labeldict_csv['name_out'], labeldict_csv['name_in']),
+            labeldict_csv['type']),
+        labeldict_csv['label']
+        ))
+
+
 def result_labeling(df, labeldictpath='labeldict.csv'):
     """
     Relabel the column names of oemof.solve result dataframes.
@@ -990,28 +1008,24 @@ def result_labeling(df, labeldictpath='labeldict.csv'):
         Relative path to the labeldict csv file. Defaults to a path in the same
         directory.
     """
-    labeldict_csv = pd.read_csv(labeldictpath, sep=';', na_filter=False)
-
-    labeldict = dict()
-    for idx in labeldict_csv.index:
-        labeldict[
-            ((labeldict_csv.loc[idx, 'name_out'],
-              labeldict_csv.loc[idx, 'name_in']),
-              labeldict_csv.loc[idx, 'type'])
-            ] = labeldict_csv.loc[idx, 'label']
+    labeldict = load_labeldict(os.path.abspath(labeldictpath))
 
     if isinstance(df, pd.DataFrame):
-        for col in df.columns:
-            if col in labeldict.keys():
-                df.rename(columns={col: labeldict[col]}, inplace=True)
-            else:
-                print(f'Column name "{col}" not in "{labeldictpath}".')
+        labels = df.columns
     elif isinstance(df, pd.Series):
-        for idx in df.index:
-            if idx in labeldict.keys():
-                df.rename(index={idx: labeldict[idx]}, inplace=True)
-            else:
-                print(f'Column name "{idx}" not in "{labeldictpath}".')
+        labels = df.index
+    else:
+        return
+
+    for label in labels:
+        if label not in labeldict:
+            print(f'Column name "{label}" not in "{labeldictpath}".')
+
+    # Rename all labels at once instead of rebuilding the index per label
+    if isinstance(df, pd.DataFrame):
+        df.rename(columns=labeldict, inplace=True)
+    else:
+        df.rename(index=labeldict, inplace=True)
 
 
 def calc_cost(label, E_N, param, uc, cost_df, add_var_cost=None):
@@ -1203,7 +1217,7 @@ def check_bew_bonus(data_all, data_caps, data, param):
         if 'P_in_sub_hp' in col:
             data_all['P_in_sub_hp'] += data_all[col]
 
-    key_params[f'sub_hp_bew_op_bonus_total'] = (
+    key_params['sub_hp_bew_op_bonus_total'] = (
         bew_op_bonus_Q_in * data_all['Q_out_sub_hp']
         ).sum()
 